@@ -10,6 +10,10 @@ from PySide6.QtGui import QPixmap, QColor, QDoubleValidator, QIntValidator
 from PySide6.QtCore import Qt, QSize, QDate
 from pathlib import Path
 
+from UI.http_cache import ETagCache
+from UI.pagination import get_all_pages
+from UI.token_refresher import TokenRefresher
+
 
 class AdminWindow(QMainWindow):
     def __init__(self, token_data):
@@ -22,6 +26,13 @@ class AdminWindow(QMainWindow):
         # Базовый URL API
         self.api_url = "http://localhost:8000"
 
+        # Токен доступа обновляется в фоне по refresh-токену
+        self.token_refresher = TokenRefresher(self.api_url, self.token_data, self)
+        self.token_refresher.start()
+
+        # Справочники перезапрашиваются с If-None-Match
+        self.http_cache = ETagCache()
+
         # Пути к иконкам
         self.icon_dir = Path(__file__).parent / "icons"
 
@@ -210,37 +221,28 @@ class AdminWindow(QMainWindow):
 
     def load_initial_data(self):
         """Загружает начальные данные для админ-панели"""
-        self.load_users()
-        self.load_products()
-        self.load_categories()
-        self.load_last_orders()
-        self.load_orders()  # Загружаем заказы для статистики
-
-    def load_orders(self):
-        """Загружает список всех заказов и обновляет статистику"""
-        try:
-            response = requests.get(
-                f"{self.api_url}/orders/",
-                headers=self.get_auth_headers()
-            )
-
-            if response.status_code == 200:
-                self.all_orders = response.json()
-                self.apply_filters()  # Применяем фильтры после загрузки
-
-                # Рассчитываем статистику
-                total_orders = len(self.all_orders)
-                total_revenue = sum(order.get('total_amount', 0) for order in self.all_orders)
-
-                # Обновляем карточки
-                self.orders_card.findChild(QLabel, "value").setText(str(total_orders))
-                self.revenue_card.findChild(QLabel, "value").setText(f"{total_revenue:,.2f} ₽".replace(",", " "))
+        # Разделы загружаются при первом открытии, главная панель — при каждом
+        self.loaded_sections = set()
+        self.section_loaders = {
+            self.users_widget: [self.load_users],
+            self.products_widget: [self.load_categories, self.load_suppliers, self.load_products],
+            self.categories_widget: [self.load_categories],
+            self.orders_widget: [self.load_orders],
+        }
+        self.stack.currentChanged.connect(self.on_section_changed)
+        self.load_dashboard_summary()  # Счётчики и последние заказы считает сервер
+
+    def on_section_changed(self, index):
+        """Загружает данные раздела при переходе в него"""
+        widget = self.stack.widget(index)
+        if widget is self.dashboard_widget:
+            self.load_dashboard_summary()
+            return
 
-            else:
-                QMessageBox.warning(self, "Ошибка",
-                                    f"Не удалось загрузить заказы. Код ошибки: {response.status_code}")
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
+        for loader in self.section_loaders.get(widget, []):
+            if loader not in self.loaded_sections:
+                self.loaded_sections.add(loader)
+                loader()
 
     def create_dashboard_widget(self):
         """Создает виджет главной панели"""
@@ -299,33 +301,27 @@ class AdminWindow(QMainWindow):
 
         return widget
 
-    def load_last_orders(self):
-        """Загружает последние заказы за последние 3 дня"""
+    def load_dashboard_summary(self):
+        """Загружает сводку для главной панели: счётчики, выручку и последние заказы"""
         try:
             response = requests.get(
-                f"{self.api_url}/orders/",
+                f"{self.api_url}/dashboard/summary",
                 headers=self.get_auth_headers()
             )
 
             if response.status_code == 200:
-                orders = response.json()
-
-                # Фильтруем заказы за последние 3 дня
-                three_days_ago = datetime.datetime.now() - datetime.timedelta(days=3)
-                recent_orders = []
-                for order in orders:
-                    date_str = order.get("order_date", "")
-                    try:
-                        order_date = datetime.datetime.fromisoformat(date_str.replace("Z", ""))
-                        if order_date >= three_days_ago:
-                            recent_orders.append(order)
-                    except ValueError:
-                        continue
-
-                self.update_last_orders_table(recent_orders)
+                summary = response.json()
+
+                self.users_card.findChild(QLabel, "value").setText(str(summary["users_count"]))
+                self.products_card.findChild(QLabel, "value").setText(str(summary["products_count"]))
+                self.orders_card.findChild(QLabel, "value").setText(str(summary["orders_count"]))
+                self.revenue_card.findChild(QLabel, "value").setText(
+                    f"{summary['total_revenue']:,.2f} ₽".replace(",", " "))
+
+                self.update_last_orders_table(summary["recent_orders"])
             else:
                 QMessageBox.warning(self, "Ошибка",
-                                    f"Не удалось загрузить заказы. Код ошибки: {response.status_code}")
+                                    f"Не удалось загрузить сводку. Код ошибки: {response.status_code}")
         except requests.exceptions.RequestException as e:
             QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
 
@@ -630,43 +626,37 @@ class AdminWindow(QMainWindow):
         """Загружает список пользователей"""
         try:
             # Загружаем клиентов
-            response = requests.get(
+            response, customers = get_all_pages(
                 f"{self.api_url}/customers/",
                 headers=self.get_auth_headers()
             )
             if response.status_code == 200:
-                customers = response.json()
                 self.update_users_table(customers, "Клиенты")
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось загрузить клиентов")
 
             # Загружаем сотрудников
-            response = requests.get(
+            response, employees = get_all_pages(
                 f"{self.api_url}/employees/",
                 headers=self.get_auth_headers()
             )
             if response.status_code == 200:
-                employees = response.json()
                 self.update_users_table(employees, "Сотрудники")
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось загрузить сотрудников")
 
             # Загружаем поставщиков
-            response = requests.get(
+            response, suppliers = get_all_pages(
                 f"{self.api_url}/suppliers/",
-                headers=self.get_auth_headers()
+                headers=self.get_auth_headers(),
+                get=self.http_cache.get
             )
             if response.status_code == 200:
-                suppliers = response.json()
                 self.update_users_table(suppliers, "Поставщики")
                 self.suppliers = suppliers  # Сохраняем данные о поставщиках
             else:
                 QMessageBox.warning(self, "Ошибка", "Не удалось загрузить поставщиков")
 
-            # Обновляем карточку в dashboard
-            total_users = len(customers) + len(employees) + len(suppliers)
-            self.users_card.findChild(QLabel, "value").setText(str(total_users))
-
         except requests.exceptions.RequestException as e:
             QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
 
@@ -1469,40 +1459,74 @@ class AdminWindow(QMainWindow):
 
         return widget
 
+    def fill_filter_combo(self, combo, items, all_text):
+        """Заполняет выпадающий список фильтра, сохраняя выбранное значение"""
+        current = combo.currentData()
+        combo.clear()
+        combo.addItem(all_text, "all")
+        for item in items:
+            combo.addItem(item.get("name", ""), item.get("id", 0))
+        combo.setCurrentIndex(max(combo.findData(current), 0))
+
     def apply_product_filters(self):
-        """Применяет фильтры к таблице товаров"""
-        name_filter = self.name_filter_edit.text().lower()
+        """Применяет фильтры к таблице товаров (фильтрация выполняется на сервере)"""
+        name_filter = self.name_filter_edit.text().strip()
         category_filter = self.category_filter_combo.currentData()
         supplier_filter = self.supplier_filter_combo.currentData()
 
-        filtered_products = self.products_data
-
+        params = {}
         if name_filter:
-            filtered_products = [p for p in filtered_products if name_filter in p.get("name", "").lower()]
-
+            params["name"] = name_filter
         if category_filter != "all":
-            filtered_products = [p for p in filtered_products if p.get("category_id") == category_filter]
-
+            params["category_id"] = category_filter
         if supplier_filter != "all":
-            filtered_products = [p for p in filtered_products if p.get("supplier_id") == supplier_filter]
+            params["supplier_id"] = supplier_filter
+
+        try:
+            response, products = get_all_pages(
+                f"{self.api_url}/products/",
+                params=params,
+                headers=self.get_auth_headers(),
+                get=self.http_cache.get
+            )
 
-        self.update_products_table(filtered_products)
+            if response.status_code == 200:
+                self.products_data = products
+                self.update_products_table(self.products_data)
+            else:
+                QMessageBox.warning(self, "Ошибка",
+                                    f"Не удалось загрузить товары. Код ошибки: {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
+
+    def load_suppliers(self):
+        """Загружает поставщиков для форм товаров"""
+        try:
+            response, suppliers = get_all_pages(
+                f"{self.api_url}/suppliers/",
+                headers=self.get_auth_headers(),
+                get=self.http_cache.get
+            )
+            if response.status_code == 200:
+                self.suppliers = suppliers
+                self.fill_filter_combo(self.supplier_filter_combo, suppliers, "Все поставщики")
+            else:
+                QMessageBox.warning(self, "Ошибка", "Не удалось загрузить поставщиков")
+        except requests.exceptions.RequestException as e:
+            QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
 
     def load_products(self):
         """Загружает список товаров с сервера"""
         try:
-            response = requests.get(
+            response, products = get_all_pages(
                 f"{self.api_url}/products/",
-                headers=self.get_auth_headers()
+                headers=self.get_auth_headers(),
+                get=self.http_cache.get
             )
 
             if response.status_code == 200:
-                products = response.json()
                 self.products_data = products  # Сохраняем данные для последующего использования
                 self.update_products_table(products)
-
-                # Обновляем карточку в dashboard
-                self.products_card.findChild(QLabel, "value").setText(str(len(products)))
             else:
                 QMessageBox.warning(self, "Ошибка",
                                     f"Не удалось загрузить товары. Код ошибки: {response.status_code}")
@@ -1637,7 +1661,6 @@ class AdminWindow(QMainWindow):
                 "description": desc_edit.toPlainText(),
                 "category_id": category_combo.currentData(),
                 "price": float(price_edit.text()),
-                "stock_quantity": stock_edit.value(),
                 "supplier_id": supplier_combo.currentData()
             }
 
@@ -1722,7 +1745,6 @@ class AdminWindow(QMainWindow):
                 "description": desc_edit.toPlainText(),
                 "category_id": category_combo.currentData(),
                 "price": float(price_edit.text()),
-                "stock_quantity": stock_edit.value(),
                 "supplier_id": supplier_combo.currentData()
             }
 
@@ -1736,9 +1758,7 @@ class AdminWindow(QMainWindow):
                 operation_type = "приход" if quantity_diff > 0 else "расход"
 
                 # Получаем корректный employee_id
-                print("TOKEN DATA:", self.token_data)
                 employee_id = self.token_data.get("employee_id")
-                print("EMPLOYEE_ID:", employee_id)
 
                 if employee_id is None or employee_id == 0:
                     QMessageBox.warning(self, "Ошибка", "Некорректный employee_id")
@@ -1920,7 +1940,7 @@ class AdminWindow(QMainWindow):
     def load_categories(self):
         """Загружает список категорий"""
         try:
-            response = requests.get(
+            response = self.http_cache.get(
                 f"{self.api_url}/product-categories/",
                 headers=self.get_auth_headers()
             )
@@ -1928,6 +1948,7 @@ class AdminWindow(QMainWindow):
             if response.status_code == 200:
                 categories = response.json()
                 self.update_categories_table(categories)
+                self.fill_filter_combo(self.category_filter_combo, categories, "Все категории")
             else:
                 QMessageBox.warning(self, "Ошибка",
                                     f"Не удалось загрузить категории. Код ошибки: {response.status_code}")
@@ -2238,8 +2259,6 @@ class AdminWindow(QMainWindow):
         # Подключение сигналов
         self.orders_table.itemSelectionChanged.connect(self.update_action_buttons)
 
-        self.load_orders()
-
         return widget
 
     def show_selected_order_details(self):
@@ -2277,49 +2296,35 @@ class AdminWindow(QMainWindow):
             self.cancel_btn.setEnabled(False)
 
     def apply_filters(self):
-        """Применяет фильтры к загруженным данным"""
+        """Загружает заказы с учётом фильтров (фильтрация выполняется на сервере)"""
         status_filter = self.status_combo.currentData()
-        date_from = self.date_from_edit.date()
-        date_to = self.date_to_edit.date()
-
-        self.filtered_orders = []
-
-        for order in self.all_orders:
-            # Фильтрация по статусу
-            if status_filter != "all" and order.get("status") != status_filter:
-                continue
-
-            # Фильтрация по дате
-            order_date_str = order.get("order_date", "")
-            try:
-                order_date = QDate.fromString(order_date_str[:10], "yyyy-MM-dd")
-                if not (date_from <= order_date <= date_to):
-                    continue
-            except:
-                continue
-
-            self.filtered_orders.append(order)
-
-        self.update_orders_table(self.filtered_orders)
-        self.update_orders_stats(self.filtered_orders)
+        params = {
+            "start_date": self.date_from_edit.date().toString("yyyy-MM-dd"),
+            "end_date": self.date_to_edit.date().toString("yyyy-MM-dd"),
+        }
+        if status_filter != "all":
+            params["status"] = status_filter
 
-    def load_orders(self):
-        """Загружает список всех заказов"""
         try:
-            response = requests.get(
+            response, orders = get_all_pages(
                 f"{self.api_url}/orders/",
+                params=params,
                 headers=self.get_auth_headers()
             )
 
             if response.status_code == 200:
-                self.all_orders = response.json()
-                self.apply_filters()  # Применяем фильтры после загрузки
+                self.filtered_orders = orders
+                self.update_orders_table(self.filtered_orders)
             else:
                 QMessageBox.warning(self, "Ошибка",
                                     f"Не удалось загрузить заказы. Код ошибки: {response.status_code}")
         except requests.exceptions.RequestException as e:
             QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
 
+    def load_orders(self):
+        """Загружает список заказов по текущим фильтрам"""
+        self.apply_filters()
+
     def update_orders_table(self, orders):
         """Обновляет таблицу заказов"""
         self.orders_table.setRowCount(len(orders))
@@ -2369,15 +2374,6 @@ class AdminWindow(QMainWindow):
             status_item.setForeground(QColor(status_colors.get(status, "#000000")))
             self.orders_table.setItem(row, 4, status_item)
 
-    def update_orders_stats(self, orders):
-        """Обновляет статистику по заказам"""
-        total_orders = len(orders)
-        total_amount = sum(order.get("total_amount", 0) for order in orders)
-
-        # Обновляем карточки в dashboard
-        self.orders_card.findChild(QLabel, "value").setText(str(total_orders))
-        self.revenue_card.findChild(QLabel, "value").setText(f"{total_amount:,.2f} ₽".replace(",", " "))
-
     def show_order_details(self, order):
         """Показывает детали заказа с корректным форматированием времени"""
         dialog = QDialog(self)
@@ -2501,7 +2497,8 @@ class AdminWindow(QMainWindow):
             )
 
             if response.status_code == 200:
-                self.load_orders()  # Перезагружаем данные и статистику
+                self.load_orders()
+                self.load_dashboard_summary()  # Статусы влияют на выручку в карточках
                 QMessageBox.information(self, "Успех", f"Статус заказа изменен на '{new_status}'")
             else:
                 error_msg = f"Не удалось изменить статус. Код ошибки: {response.status_code}"
@@ -2775,13 +2772,12 @@ class AdminWindow(QMainWindow):
     def load_warehouse_data(self):
         """Загружает данные о складских операциях"""
         try:
-            response = requests.get(
+            response, stock_operations = get_all_pages(
                 f"{self.api_url}/stock-operations/",
                 headers=self.get_auth_headers()
             )
 
             if response.status_code == 200:
-                stock_operations = response.json()
                 self.update_warehouse_table(stock_operations)
             else:
                 QMessageBox.warning(self, "Ошибка",
@@ -2985,57 +2981,19 @@ class AdminWindow(QMainWindow):
         date_to = self.date_to_edit.date().toString("yyyy-MM-dd")
 
         try:
-            # Получаем данные о заказах за выбранный период
-            response = requests.get(
-                f"{self.api_url}/orders/",
-                params={"start_date": date_from, "end_date": date_to},
+            # Выручку за период сервер считает сам и сразу сохраняет отчет
+            response = requests.post(
+                f"{self.api_url}/reports/",
+                json={"start_date": date_from, "end_date": date_to},
                 headers=self.get_auth_headers()
             )
 
-            if response.status_code == 200:
-                orders = response.json()
-                total_revenue = sum(order.get("total_amount", 0) for order in orders)
-
-                # Получаем данные о расходах за выбранный период
-                expenses_response = requests.get(
-                    f"{self.api_url}/expenses/",
-                    params={"start_date": date_from, "end_date": date_to},
-                    headers=self.get_auth_headers()
-                )
-
-                if expenses_response.status_code == 200:
-                    expenses = expenses_response.json()
-                    total_expenses = sum(expense.get("amount", 0) for expense in expenses)
-
-                    # Рассчитываем прибыль
-                    profit = total_revenue - total_expenses
-
-                    # Создаем новый отчет
-                    new_report = {
-                        "report_date": QDate.currentDate().toString("yyyy-MM-dd"),
-                        "total_revenue": total_revenue,
-                        "total_expenses": total_expenses,
-                        "profit": profit
-                    }
-
-                    # Отправляем отчет на сервер
-                    response = requests.post(
-                        f"{self.api_url}/reports/",
-                        json=new_report,
-                        headers=self.get_auth_headers()
-                    )
-
-                    if response.status_code == 201:
-                        QMessageBox.information(self, "Успех", "Новый отчет успешно создан")
-                        self.load_finance_reports()
-                    else:
-                        QMessageBox.warning(self, "Ошибка",
-                                            f"Не удалось создать отчет. Код ошибки: {response.status_code}")
-                else:
-                    QMessageBox.warning(self, "Ошибка",
-                                        f"Не удалось загрузить расходы. Код ошибки: {expenses_response.status_code}")
+            if response.status_code == 201:
+                QMessageBox.information(self, "Успех", "Новый отчет успешно создан")
+                self.load_finance_reports()
             else:
-                QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить заказы. Код ошибки: {response.status_code}")
+                QMessageBox.warning(self, "Ошибка",
+                                    f"Не удалось создать отчет. Код ошибки: {response.status_code}")
         except requests.exceptions.RequestException as e:
             QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
 
@@ -3044,13 +3002,12 @@ class AdminWindow(QMainWindow):
     def load_finance_reports(self):
         """Загружает финансовые отчеты"""
         try:
-            response = requests.get(
+            response, reports = get_all_pages(
                 f"{self.api_url}/reports/",
                 headers=self.get_auth_headers()
             )
 
             if response.status_code == 200:
-                reports = response.json()
                 self.update_finance_reports_table(reports)
             else:
                 QMessageBox.warning(self, "Ошибка",
@@ -3299,6 +3256,7 @@ class AdminWindow(QMainWindow):
         if QMessageBox.question(self, "Подтверждение",
                                "Вы действительно хотите выйти из системы?",
                                QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            self.token_refresher.logout()
             event.accept()
         else:
             event.ignore()
\ No newline at end of file
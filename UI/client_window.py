@@ -4,11 +4,15 @@ import requests
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                                QPushButton, QStackedWidget, QListWidget, QListWidgetItem,
                                QFrame, QSpacerItem, QSizePolicy, QMenuBar, QMenu, QMessageBox, QFormLayout, QDialog,
-                               QLineEdit, QDialogButtonBox, QScrollArea)
-from PySide6.QtGui import QIcon, QPixmap
+                               QLineEdit, QDialogButtonBox, QScrollArea, QComboBox, QCheckBox)
+from PySide6.QtGui import QIcon, QPixmap, QDoubleValidator
 from PySide6.QtCore import Qt, QSize
 from pathlib import Path
 
+from UI.http_cache import ETagCache
+from UI.pagination import get_all_pages
+from UI.token_refresher import TokenRefresher
+
 
 class ClientWindow(QMainWindow):
     def __init__(self, token_data):
@@ -23,6 +27,13 @@ class ClientWindow(QMainWindow):
         # Базовый URL API
         self.api_url = "http://localhost:8000"
 
+        # Токен доступа обновляется в фоне по refresh-токену
+        self.token_refresher = TokenRefresher(self.api_url, self.token_data, self)
+        self.token_refresher.start()
+
+        # Справочники перезапрашиваются с If-None-Match
+        self.http_cache = ETagCache()
+
         # Пути к иконкам
         self.icon_dir = Path(__file__).parent / "icons"
 
@@ -45,7 +56,8 @@ class ClientWindow(QMainWindow):
         # Создаем навигационное меню
         self.create_navigation()
 
-        # Загружаем товары с сервера
+        # Загружаем категории для фильтра и товары с сервера
+        self.load_categories()
         self.load_products()
 
         # Стилизация
@@ -149,16 +161,57 @@ class ClientWindow(QMainWindow):
             "Content-Type": "application/json"
         }
 
+    def load_categories(self):
+        """Загружает категории для фильтра каталога"""
+        try:
+            response = self.http_cache.get(
+                f"{self.api_url}/product-categories/",
+                headers=self.get_auth_headers()
+            )
+            if response.status_code != 200:
+                return
+        except requests.exceptions.RequestException:
+            return
+
+        current = self.category_filter_combo.currentData()
+        self.category_filter_combo.clear()
+        self.category_filter_combo.addItem("Все категории", "all")
+        for category in response.json():
+            self.category_filter_combo.addItem(category.get("name", ""), category.get("id", 0))
+        index = self.category_filter_combo.findData(current)
+        self.category_filter_combo.setCurrentIndex(max(index, 0))
+
+    def get_product_filters(self):
+        """Собирает параметры запроса каталога из панели фильтров"""
+        params = {"sort": self.sort_combo.currentData()}
+        name_filter = self.name_filter_edit.text().strip()
+        if name_filter:
+            params["name"] = name_filter
+        category_filter = self.category_filter_combo.currentData()
+        if category_filter != "all":
+            params["category_id"] = category_filter
+        min_price = self.min_price_edit.text().replace(",", ".")
+        if min_price:
+            params["min_price"] = min_price
+        max_price = self.max_price_edit.text().replace(",", ".")
+        if max_price:
+            params["max_price"] = max_price
+        if self.in_stock_check.isChecked():
+            params["in_stock"] = "true"
+        return params
+
     def load_products(self):
-        """Загружает товары с сервера"""
+        """Загружает товары с сервера (фильтрация и сортировка выполняются на сервере)"""
         try:
-            response = requests.get(
+            response, products = get_all_pages(
                 f"{self.api_url}/products/",
-                headers=self.get_auth_headers()
+                params=self.get_product_filters(),
+                headers=self.get_auth_headers(),
+                get=self.http_cache.get
             )
 
             if response.status_code == 200:
-                self.products = response.json()
+                self.products = products
                 self.update_product_list()
             elif response.status_code == 401:
                 self.show_error("Ошибка авторизации", "Не удалось авторизоваться. Пожалуйста, войдите снова.")
@@ -731,18 +784,21 @@ class ClientWindow(QMainWindow):
             for item in self.cart.values()
         )
 
-        # 1. Создаем основной заказ
+        # Заказ и все его позиции отправляются одним запросом,
+        # итоговую сумму сервер рассчитывает сам
         order_data = {
             "customer_id": customer_id,
-            "order_date": datetime.datetime.now().isoformat(),
+            "order_date": datetime.datetime.now().astimezone().isoformat(),
             "status": "Оплачен",
-            "total_amount": total_price
+            "lines": [
+                {"product_id": product_id, "quantity": item["quantity"]}
+                for product_id, item in self.cart.items()
+            ]
         }
 
         try:
-            # Отправляем POST запрос для создания заказа
             response = requests.post(
-                f"{self.api_url}/orders/",
+                f"{self.api_url}/orders/checkout",
                 json=order_data,
                 headers=self.get_auth_headers()
             )
@@ -752,28 +808,7 @@ class ClientWindow(QMainWindow):
 
             order_response = response.json()
             order_id = order_response.get("id")
-
-            if not order_id:
-                raise Exception("Не удалось получить ID созданного заказа")
-
-            # 2. Создаем детали заказа для каждого товара
-            for product_id, item in self.cart.items():
-                product = item["product"]
-                detail_data = {
-                    "order_id": order_id,
-                    "product_id": product_id,
-                    "quantity": item["quantity"],
-                    "price_per_unit": float(product.get("price", 0))
-                }
-
-                response = requests.post(
-                    f"{self.api_url}/order-details/",
-                    json=detail_data,
-                    headers=self.get_auth_headers()
-                )
-
-                if response.status_code != 201:
-                    raise Exception(f"Ошибка добавления деталей заказа: {response.status_code} - {response.text}")
+            total_price = float(order_response.get("total_amount", total_price))
 
             # Если все успешно, показываем сообщение и очищаем корзину
             QMessageBox.information(
@@ -828,6 +863,45 @@ class ClientWindow(QMainWindow):
         top_layout.addStretch()
         top_layout.addWidget(refresh_btn)
 
+        # Панель фильтров
+        filter_panel = QWidget()
+        filter_layout = QHBoxLayout(filter_panel)
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.name_filter_edit = QLineEdit()
+        self.name_filter_edit.setPlaceholderText("Название товара")
+        self.name_filter_edit.returnPressed.connect(self.load_products)
+        filter_layout.addWidget(self.name_filter_edit)
+
+        self.category_filter_combo = QComboBox()
+        self.category_filter_combo.addItem("Все категории", "all")
+        filter_layout.addWidget(self.category_filter_combo)
+
+        self.min_price_edit = QLineEdit()
+        self.min_price_edit.setPlaceholderText("Цена от")
+        self.min_price_edit.setValidator(QDoubleValidator(0, 999999, 2))
+        self.min_price_edit.setFixedWidth(90)
+        filter_layout.addWidget(self.min_price_edit)
+
+        self.max_price_edit = QLineEdit()
+        self.max_price_edit.setPlaceholderText("Цена до")
+        self.max_price_edit.setValidator(QDoubleValidator(0, 999999, 2))
+        self.max_price_edit.setFixedWidth(90)
+        filter_layout.addWidget(self.max_price_edit)
+
+        self.in_stock_check = QCheckBox("В наличии")
+        filter_layout.addWidget(self.in_stock_check)
+
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItem("По названию", "name")
+        self.sort_combo.addItem("Сначала дешевле", "price")
+        self.sort_combo.addItem("Сначала дороже", "-price")
+        filter_layout.addWidget(self.sort_combo)
+
+        apply_filter_btn = QPushButton("Найти")
+        apply_filter_btn.clicked.connect(self.load_products)
+        filter_layout.addWidget(apply_filter_btn)
+
         # Список товаров с карточками
         self.product_list_widget = QListWidget()
         self.product_list_widget.setVerticalScrollMode(QListWidget.ScrollPerPixel)
@@ -836,6 +910,7 @@ class ClientWindow(QMainWindow):
         self.product_list_widget.itemClicked.connect(self.highlight_product_card)
 
         main_layout.addWidget(top_panel)
+        main_layout.addWidget(filter_panel)
         main_layout.addWidget(self.product_list_widget)
 
         return widget
@@ -1208,10 +1283,6 @@ class ClientWindow(QMainWindow):
             return
 
         try:
-            # Если товары еще не загружены, загружаем их
-            if not hasattr(self, 'products') or not self.products:
-                self.load_products()
-
             # Загружаем список заказов
             response = requests.get(
                 f"{self.api_url}/orders/customer/{customer_id}",
@@ -1356,12 +1427,7 @@ class ClientWindow(QMainWindow):
                 product_layout = QHBoxLayout(product_widget)
                 product_layout.setContentsMargins(0, 5, 0, 5)
 
-                # Проверяем, загружены ли товары
-                product_name = "Неизвестный товар"
-                if hasattr(self, 'products') and self.products:
-                    product = next((p for p in self.products if p['id'] == detail['product_id']), None)
-                    if product:
-                        product_name = product.get('name', "Неизвестный товар")
+                product_name = detail.get("product_name") or "Неизвестный товар"
 
                 name_label = QLabel(product_name)
                 name_label.setStyleSheet("font-size: 14px;")
@@ -1454,12 +1520,7 @@ class ClientWindow(QMainWindow):
                 product_layout = QHBoxLayout(product_widget)
                 product_layout.setContentsMargins(0, 0, 0, 0)
 
-                # Проверяем, загружены ли товары
-                product_name = "Неизвестный товар"
-                if hasattr(self, 'products') and self.products:
-                    product = next((p for p in self.products if p['id'] == detail['product_id']), None)
-                    if product:
-                        product_name = product.get('name', "Неизвестный товар")
+                product_name = detail.get("product_name") or "Неизвестный товар"
 
                 name_label = QLabel(product_name)
                 name_label.setStyleSheet("font-size: 14px;")
@@ -1603,4 +1664,9 @@ class ClientWindow(QMainWindow):
         """Обновляет состояние кнопок навигации и счетчик"""
         self.prev_btn.setDisabled(self.current_order_index == 0)
         self.next_btn.setDisabled(self.current_order_index == len(self.all_orders) - 1)
-        self.order_counter.setText(f"{self.current_order_index + 1} / {len(self.all_orders)}")
\ No newline at end of file
+        self.order_counter.setText(f"{self.current_order_index + 1} / {len(self.all_orders)}")
+
+    def closeEvent(self, event):
+        """Обработчик закрытия окна"""
+        self.token_refresher.logout()
+        super().closeEvent(event)
@@ -0,0 +1,34 @@
+import requests
+
+
+class ETagCache:
+    """
+    Условные GET-запросы к справочникам.
+
+    Запоминает последний ответ с ETag для каждого URL и параметров и
+    отправляет If-None-Match; если сервер ответил 304, возвращается
+    сохранённый ответ, так что вызывающий код работает с ним как с обычным 200.
+    """
+
+    def __init__(self):
+        self._responses = {}
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self._responses.get(key)
+
+        headers = dict(headers or {})
+        if cached is not None:
+            headers["If-None-Match"] = cached.headers["ETag"]
+
+        response = requests.get(url, headers=headers, params=params, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached
+        if response.status_code == 200 and "ETag" in response.headers:
+            self._responses[key] = response
+        else:
+            self._responses.pop(key, None)
+        return response
+
+    def clear(self):
+        self._responses.clear()
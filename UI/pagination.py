@@ -0,0 +1,27 @@
+import requests
+
+# Заголовок, в котором сервер передаёт курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def get_all_pages(url, headers=None, params=None, get=requests.get, **kwargs):
+    """
+    Загружает все страницы списочного эндпоинта, передавая курсор
+    из X-Next-Cursor в параметре after, пока сервер его возвращает.
+
+    Возвращает (response, items): последний ответ и элементы всех страниц;
+    если какая-то страница вернулась не с кодом 200 — этот ответ и None.
+    get — функция запроса (requests.get или ETagCache.get).
+    """
+    params = dict(params or {})
+    items = []
+    while True:
+        response = get(url, headers=headers, params=params, **kwargs)
+        if response.status_code != 200:
+            return response, None
+
+        items.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return response, items
+        params["after"] = cursor
@@ -10,6 +10,9 @@ from PySide6.QtGui import QIcon, QPixmap, QColor, QDoubleValidator, QIntValidato
 from PySide6.QtCore import Qt, QSize
 from pathlib import Path
 
+from UI.http_cache import ETagCache
+from UI.token_refresher import TokenRefresher
+
 
 class SupplierWindow(QMainWindow):
     def __init__(self, token_data):
@@ -17,7 +20,7 @@ class SupplierWindow(QMainWindow):
         self.token_data = token_data
         self.supplier_id = token_data.get('supplier_id')
         self.access_token = token_data.get('access_token')
-        self.sales_data = []  # <-- Добавлено инициализацию атрибута
+        self.sales_analytics = {}
 
         if "supplier_id" not in token_data:
             QMessageBox.warning(self, "Предупреждение",
@@ -29,6 +32,13 @@ class SupplierWindow(QMainWindow):
         # Базовый URL API
         self.api_url = "http://localhost:8000"
 
+        # Токен доступа обновляется в фоне по refresh-токену
+        self.token_refresher = TokenRefresher(self.api_url, self.token_data, self)
+        self.token_refresher.start()
+
+        # Справочники перезапрашиваются с If-None-Match
+        self.http_cache = ETagCache()
+
         # Пути к иконкам
         self.icon_dir = Path(__file__).parent / "icons"
 
@@ -196,7 +206,7 @@ class SupplierWindow(QMainWindow):
                 QMessageBox.warning(self, "Ошибка", "ID поставщика не найден")
                 return
 
-            response = requests.get(
+            response = self.http_cache.get(
                 f"{self.api_url}/products/supplier/{supplier_id}",
                 headers=self.get_auth_headers()
             )
@@ -365,8 +375,7 @@ class SupplierWindow(QMainWindow):
                 "description": desc_edit.toPlainText(),
                 "price": float(price_edit.text()),
                 "category_id": int(category_edit.text()),
-                "supplier_id": product.get("supplier_id", 0),
-                "stock_quantity": product.get("stock_quantity", 0)
+                "supplier_id": product.get("supplier_id", 0)
             }
 
             try:
@@ -399,13 +408,13 @@ class SupplierWindow(QMainWindow):
 
         form_layout = QFormLayout()
         quantity_edit = QLineEdit()
-        quantity_edit.setPlaceholderText("Новое количество")
-        quantity_edit.setValidator(QIntValidator(0, 999999))
-        form_layout.addRow("Количество:", quantity_edit)
+        quantity_edit.setPlaceholderText("Например, 10 или -5")
+        quantity_edit.setValidator(QIntValidator(-999999, 999999))
+        form_layout.addRow("Изменение:", quantity_edit)
 
         layout.addLayout(form_layout)
 
-        note_label = QLabel("Укажите абсолютное количество, а не изменение")
+        note_label = QLabel("Плюс — приход, минус — списание")
         note_label.setStyleSheet("font-size: 12px; color: #7f8c8d;")
         note_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(note_label)
@@ -419,7 +428,7 @@ class SupplierWindow(QMainWindow):
             try:
                 response = requests.patch(
                     f"{self.api_url}/products/{product['id']}/stock",
-                    json={"stock_quantity": int(quantity_edit.text())},
+                    json={"quantity_change": int(quantity_edit.text())},
                     headers=self.get_auth_headers()
                 )
 
@@ -919,17 +928,15 @@ class SupplierWindow(QMainWindow):
                 "end_date": end_date
             }
 
-            print(f"Requesting data for period: {start_date} to {end_date}")  # Для отладки
-
+            # Агрегаты считает сервер: ответ не зависит от числа строк заказов
             response = requests.get(
-                f"{self.api_url}/order-details/supplier/{supplier_id}",
+                f"{self.api_url}/order-details/supplier/{supplier_id}/analytics",
                 params=params,
                 headers=self.get_auth_headers()
             )
 
             if response.status_code == 200:
-                sales_data = response.json()
-                self.process_sales_data(sales_data)
+                self.process_sales_data(response.json())
             else:
                 error_msg = f"Не удалось загрузить статистику продаж. Код ошибки: {response.status_code}"
                 if response.status_code == 404:
@@ -941,31 +948,29 @@ class SupplierWindow(QMainWindow):
             QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
             self.clear_stats()
 
-    def process_sales_data(self, sales_data):
-        """Обрабатывает данные о продажах и обновляет интерфейс"""
-        # Сохраняем данные о продажах в атрибуте класса
-        self.sales_data = sales_data  # <-- Добавлено сохранение данных
+    def process_sales_data(self, analytics):
+        """Обновляет интерфейс по агрегатам продаж (/order-details/supplier/{id}/analytics)"""
+        self.sales_analytics = analytics
 
-        if not sales_data:
+        if not analytics.get("lines_count"):
             self.clear_stats()
             QMessageBox.information(self, "Информация", "Нет данных о продажах за выбранный период")
             return
 
-        # Агрегируем данные
-        total_sales = len(sales_data)
-        total_quantity = sum(item['quantity'] for item in sales_data)
-        total_revenue = sum(item['quantity'] * item['price_per_unit'] for item in sales_data)
-        unique_products = len({item['product_id'] for item in sales_data})
-        unique_orders = len({item['order_id'] for item in sales_data})
-
         # Обновляем сводную статистику
-        self.update_summary_stats(total_sales, total_quantity, total_revenue, unique_products, unique_orders)
+        self.update_summary_stats(
+            analytics["lines_count"],
+            analytics["total_quantity"],
+            analytics["total_revenue"],
+            len(analytics["products"]),
+            analytics["orders_count"]
+        )
 
         # Обновляем статистику по товарам
-        self.update_products_stats(sales_data)
+        self.update_products_stats(analytics["products"])
 
         # Обновляем графики
-        self.update_charts(sales_data)
+        self.update_charts(analytics["days"])
 
     def clear_stats(self):
         """Очищает все статистические данные"""
@@ -1049,44 +1054,37 @@ class SupplierWindow(QMainWindow):
 
         self.summary_layout.addWidget(cards_container)
 
-        # Таблица с последними продажами (остается без изменений)
-        recent_label = QLabel("Последние продажи:")
+        # Таблица с продажами за последние дни периода
+        recent_label = QLabel("Последние дни продаж:")
         recent_label.setStyleSheet("font-weight: bold; margin-top: 20px;")
         self.summary_layout.addWidget(recent_label)
 
         recent_table = QTableWidget()
-        recent_table.setColumnCount(5)
-        recent_table.setHorizontalHeaderLabels(["Дата", "Товар", "Количество", "Цена", "Сумма"])
+        recent_table.setColumnCount(4)
+        recent_table.setHorizontalHeaderLabels(["Дата", "Количество", "Заказы", "Выручка"])
         recent_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         recent_table.verticalHeader().setVisible(False)
         recent_table.setEditTriggers(QTableWidget.NoEditTriggers)
         recent_table.setSelectionBehavior(QTableWidget.SelectRows)
 
-        # Заполняем таблицу (первые 10 записей)
-        recent_table.setRowCount(min(10, len(self.sales_data)))
-        for row, item in enumerate(self.sales_data[:10]):
-            # Универсальная обработка даты
-            date_str = item.get("order_date", "")
-            formatted_date = self.format_date(date_str)
-            date_item = QTableWidgetItem(formatted_date)
+        # Заполняем таблицу (последние 10 дней, новые первыми)
+        recent_days = list(reversed(self.sales_analytics.get("days", [])))[:10]
+        recent_table.setRowCount(len(recent_days))
+        for row, day in enumerate(recent_days):
+            date_item = QTableWidgetItem(datetime.date.fromisoformat(day["day"]).strftime("%d.%m.%Y"))
             recent_table.setItem(row, 0, date_item)
 
-            # Остальные колонки без изменений
-            product_item = QTableWidgetItem(item.get("product_name", "Неизвестно"))
-            recent_table.setItem(row, 1, product_item)
-
-            quantity_item = QTableWidgetItem(str(item.get("quantity", 0)))
+            quantity_item = QTableWidgetItem(str(day.get("quantity", 0)))
             quantity_item.setTextAlignment(Qt.AlignCenter)
-            recent_table.setItem(row, 2, quantity_item)
+            recent_table.setItem(row, 1, quantity_item)
 
-            price_item = QTableWidgetItem(f"{item.get('price_per_unit', 0):,.2f} ₽".replace(",", " "))
-            price_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            recent_table.setItem(row, 3, price_item)
+            orders_item = QTableWidgetItem(str(day.get("orders_count", 0)))
+            orders_item.setTextAlignment(Qt.AlignCenter)
+            recent_table.setItem(row, 2, orders_item)
 
-            total = item.get("quantity", 0) * item.get("price_per_unit", 0)
-            total_item = QTableWidgetItem(f"{total:,.2f} ₽".replace(",", " "))
-            total_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            recent_table.setItem(row, 4, total_item)
+            revenue_item = QTableWidgetItem(f"{day.get('revenue', 0):,.2f} ₽".replace(",", " "))
+            revenue_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            recent_table.setItem(row, 3, revenue_item)
 
         self.summary_layout.addWidget(recent_table)
 
@@ -1118,7 +1116,7 @@ class SupplierWindow(QMainWindow):
         # Если ни один формат не подошел, возвращаем исходную строку
         return date_str
 
-    def update_products_stats(self, sales_data):
+    def update_products_stats(self, products_sales):
         """Обновляет статистику по товарам"""
         # Очищаем предыдущие виджеты
         for i in reversed(range(self.products_layout.count())):
@@ -1126,35 +1124,18 @@ class SupplierWindow(QMainWindow):
             if widget:
                 widget.setParent(None)
 
-        # Группируем данные по товарам
-        products_stats = {}
-        for item in sales_data:
-            product_id = item['product_id']
-            if product_id not in products_stats:
-                products_stats[product_id] = {
-                    'name': item['product_name'],
-                    'quantity': 0,
-                    'revenue': 0.0,
-                    'orders': set()
-                }
-
-            products_stats[product_id]['quantity'] += item['quantity']
-            products_stats[product_id]['revenue'] += item['quantity'] * item['price_per_unit']
-            products_stats[product_id]['orders'].add(item['order_id'])
-
-        # Преобразуем в список и сортируем по выручке
-        products_list = []
-        for product_id, stats in products_stats.items():
-            products_list.append({
-                'id': product_id,
-                'name': stats['name'],
-                'quantity': stats['quantity'],
-                'revenue': stats['revenue'],
-                'orders_count': len(stats['orders']),
-                'avg_price': stats['revenue'] / stats['quantity'] if stats['quantity'] > 0 else 0
-            })
-
-        products_list.sort(key=lambda x: x['revenue'], reverse=True)
+        # Сервер уже сгруппировал продажи по товарам и отсортировал по выручке
+        products_list = [
+            {
+                'id': product['product_id'],
+                'name': product['product_name'],
+                'quantity': product['quantity'],
+                'revenue': product['revenue'],
+                'orders_count': product['orders_count'],
+                'avg_price': product['revenue'] / product['quantity'] if product['quantity'] > 0 else 0
+            }
+            for product in products_sales
+        ]
 
         # Создаем таблицу
         table = QTableWidget()
@@ -1212,7 +1193,7 @@ class SupplierWindow(QMainWindow):
 
         self.products_layout.addWidget(table)
 
-    def update_charts(self, sales_data):
+    def update_charts(self, daily_sales):
         """Обновляет вкладку с графиками"""
         # Очищаем предыдущие виджеты
         for i in reversed(range(self.charts_layout.count())):
@@ -1220,41 +1201,18 @@ class SupplierWindow(QMainWindow):
             if widget:
                 widget.setParent(None)
 
-        if not sales_data:
+        if not daily_sales:
             no_data_label = QLabel("Нет данных для построения графиков")
             no_data_label.setAlignment(Qt.AlignCenter)
             no_data_label.setStyleSheet("color: #7f8c8d; font-size: 16px;")
             self.charts_layout.addWidget(no_data_label)
             return
 
-        # Группируем данные по дням
-        daily_stats = {}
-        for item in sales_data:
-            date_str = item.get("order_date", "")
-            try:
-                date = datetime.datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ").date()
-            except ValueError:
-                continue
-
-            if date not in daily_stats:
-                daily_stats[date] = {
-                    'quantity': 0,
-                    'revenue': 0.0,
-                    'orders': set()
-                }
-
-            daily_stats[date]['quantity'] += item['quantity']
-            daily_stats[date]['revenue'] += item['quantity'] * item['price_per_unit']
-            daily_stats[date]['orders'].add(item['order_id'])
-
-        # Сортируем по дате
-        sorted_dates = sorted(daily_stats.keys())
-
-        # Подготавливаем данные для графиков
-        dates = [date.strftime("%d.%m") for date in sorted_dates]
-        quantities = [daily_stats[date]['quantity'] for date in sorted_dates]
-        revenues = [daily_stats[date]['revenue'] for date in sorted_dates]
-        orders = [len(daily_stats[date]['orders']) for date in sorted_dates]
+        # Продажи по дням приходят с сервера уже сгруппированными и отсортированными
+        dates = [datetime.date.fromisoformat(day['day']).strftime("%d.%m") for day in daily_sales]
+        quantities = [day['quantity'] for day in daily_sales]
+        revenues = [day['revenue'] for day in daily_sales]
+        orders = [day['orders_count'] for day in daily_sales]
 
         # Создаем виджеты с графиками
         charts_container = QWidget()
@@ -1317,105 +1275,6 @@ class SupplierWindow(QMainWindow):
         self.start_date_edit.setDate(start_date)
         self.end_date_edit.setDate(today)
 
-    def update_sales_stats(self):
-        """Обновляет статистику продаж"""
-        supplier_id = self.token_data.get("supplier_id")
-        if not supplier_id:
-            QMessageBox.warning(self, "Ошибка", "ID поставщика не найден")
-            return
-
-        # Определяем период
-        period_index = self.period_combo.currentIndex()
-        if period_index == 0:  # неделя
-            start_date = (datetime.datetime.now() - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
-        elif period_index == 1:  # месяц
-            start_date = (datetime.datetime.now() - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
-        elif period_index == 2:  # год
-            start_date = (datetime.datetime.now() - datetime.timedelta(days=365)).strftime("%Y-%m-%d")
-        else:  # все время
-            start_date = "2000-01-01"  # Условная дата
-
-        try:
-            # Загружаем данные о продажах
-            response = requests.get(
-                f"{self.api_url}/order-details/supplier/{supplier_id}?start_date={start_date}",
-                headers=self.get_auth_headers()
-            )
-
-            if response.status_code == 200:
-                sales_data = response.json()
-                self.update_sales_table(sales_data)
-            else:
-                QMessageBox.warning(self, "Ошибка",
-                                    f"Не удалось загрузить статистику продаж. Код ошибки: {response.status_code}")
-                self.sales_table.setRowCount(0)
-                self.update_summary_labels(0, 0, 0, 0)
-
-        except requests.exceptions.RequestException as e:
-            QMessageBox.critical(self, "Ошибка подключения", f"Не удалось подключиться к серверу: {str(e)}")
-            self.sales_table.setRowCount(0)
-            self.update_summary_labels(0, 0, 0, 0)
-
-    def update_sales_table(self, sales_data):
-        """Обновляет таблицу продаж"""
-        # Сначала собираем информацию о товарах поставщика для отображения названий
-        product_names = {}
-        for product in getattr(self, 'supplier_products', []):
-            product_names[product['id']] = product['name']
-
-        # Подсчитываем статистику
-        unique_orders = set()
-        unique_products = set()
-        total_quantity = 0
-        total_revenue = 0.0
-
-        # Устанавливаем количество строк
-        self.sales_table.setRowCount(len(sales_data))
-
-        for row, sale in enumerate(sales_data):
-            order_id = sale.get('order_id', 0)
-            product_id = sale.get('product_id', 0)
-            quantity = sale.get('quantity', 0)
-            price = sale.get('price_per_unit', 0)
-            total = quantity * price
-
-            # Обновляем статистику
-            unique_orders.add(order_id)
-            unique_products.add(product_id)
-            total_quantity += quantity
-            total_revenue += total
-
-            # Название товара
-            product_name = product_names.get(product_id, "Неизвестный товар")
-            product_item = QTableWidgetItem(product_name)
-            self.sales_table.setItem(row, 0, product_item)
-
-            # Количество
-            quantity_item = QTableWidgetItem(str(quantity))
-            quantity_item.setTextAlignment(Qt.AlignCenter)
-            self.sales_table.setItem(row, 1, quantity_item)
-
-            # Цена за единицу
-            price_item = QTableWidgetItem(f"{price:,.2f} ₽".replace(",", " "))
-            price_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.sales_table.setItem(row, 2, price_item)
-
-            # Сумма
-            total_item = QTableWidgetItem(f"{total:,.2f} ₽".replace(",", " "))
-            total_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.sales_table.setItem(row, 3, total_item)
-
-        # Обновляем итоговые данные
-        self.update_summary_labels(len(unique_orders), len(unique_products), total_quantity, total_revenue)
-
-    def update_summary_labels(self, orders_count, products_count, total_quantity, total_revenue):
-        """Обновляет итоговые метки статистики"""
-        self.total_orders_label.setText(f"Всего заказов: {orders_count}")
-        self.total_products_label.setText(f"Всего товаров: {products_count}")
-        self.total_quantity_label.setText(f"Всего продано: {total_quantity} шт.")
-        self.total_revenue_label.setText(f"Общая выручка: {total_revenue:,.2f} ₽".replace(",", " "))
-
-
     def update_summary_tab(self, summary_data):
         """Обновляет вкладку сводной статистики"""
         # Очищаем предыдущие виджеты
@@ -1595,4 +1454,9 @@ class SupplierWindow(QMainWindow):
 
             table.setItem(row, 5, rating_item)
 
-        self.products_layout.addWidget(table)
\ No newline at end of file
+        self.products_layout.addWidget(table)
+
+    def closeEvent(self, event):
+        """Обработчик закрытия окна"""
+        self.token_refresher.logout()
+        super().closeEvent(event)
@@ -0,0 +1,111 @@
+import logging
+import threading
+
+import requests
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher(QObject):
+    """
+    Фоновое обновление токена доступа по refresh-токену.
+
+    Новые токены записываются прямо в token_data окна, поэтому
+    get_auth_headers() сразу начинает отдавать свежий токен, а пароль
+    повторно не запрашивается до конца сессии устройства.
+    """
+
+    # Обновляем заранее, когда прошла эта доля срока действия токена
+    REFRESH_AT = 0.8
+    # Повтор после сетевой ошибки, мс
+    RETRY_INTERVAL = 60 * 1000
+
+    # Результат запроса из фонового потока: новые токены (или None) и задержка
+    # до следующей попытки (None — больше не обновлять)
+    _finished = Signal(object, object)
+
+    def __init__(self, api_url, token_data, parent=None):
+        super().__init__(parent)
+        self.api_url = api_url
+        self.token_data = token_data
+        self._in_flight = False
+        self._stopped = False
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.refresh_in_background)
+        # Слот выполняется в потоке интерфейса, которому принадлежат таймер и token_data
+        self._finished.connect(self._on_finished, Qt.QueuedConnection)
+
+    def start(self):
+        """Планирует первое обновление (для старых серверов без refresh-токенов ничего не делает)"""
+        self._stopped = False
+        if self.token_data.get("refresh_token") and self.token_data.get("expires_in"):
+            self.timer.start(int(self.token_data["expires_in"] * self.REFRESH_AT * 1000))
+
+    def stop(self):
+        """Останавливает обновление; ответ запроса, который уже выполняется, будет отброшен"""
+        self._stopped = True
+        self.timer.stop()
+
+    def logout(self):
+        """
+        Останавливает обновление и завершает сессию на сервере: отзывает токен
+        доступа и refresh-токен устройства. Ошибки сети только логируются —
+        окно закрывается в любом случае.
+        """
+        self.stop()
+        if not self.token_data.get("access_token"):
+            return
+        refresh_token = self.token_data.get("refresh_token")
+        try:
+            response = requests.post(
+                f"{self.api_url}/auth/logout",
+                json={"refresh_token": refresh_token} if refresh_token else None,
+                headers={"Authorization": f"Bearer {self.token_data['access_token']}"},
+                timeout=3
+            )
+            if response.status_code != 200:
+                logger.warning("Не удалось завершить сессию: код ответа %s", response.status_code)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Не удалось завершить сессию: %s", e)
+
+    def refresh_in_background(self):
+        if self._in_flight or self._stopped:
+            return
+        self._in_flight = True
+        # Запрос идёт в отдельном потоке, чтобы не подвешивать интерфейс
+        threading.Thread(target=self._refresh, args=(self.token_data["refresh_token"],), daemon=True).start()
+
+    def _refresh(self, refresh_token):
+        tokens, delay = None, self.RETRY_INTERVAL
+        try:
+            response = requests.post(
+                f"{self.api_url}/auth/refresh",
+                json={"refresh_token": refresh_token},
+                timeout=10
+            )
+            if response.status_code == 200:
+                tokens = response.json()
+                delay = int(tokens["expires_in"] * self.REFRESH_AT * 1000)
+            elif response.status_code == 401:
+                # Сессия отозвана (смена пароля, выход) — дальше нужен вход по паролю
+                logger.warning("Refresh-токен отклонён сервером")
+                delay = None
+            else:
+                logger.warning("Не удалось обновить токен: код ответа %s", response.status_code)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Не удалось обновить токен: %s", e)
+        self._finished.emit(tokens, delay)
+
+    def _on_finished(self, tokens, delay):
+        self._in_flight = False
+        if self._stopped:
+            return
+        if tokens is not None:
+            self.token_data["access_token"] = tokens["access_token"]
+            self.token_data["refresh_token"] = tokens["refresh_token"]
+            self.token_data["expires_in"] = tokens["expires_in"]
+        if delay is not None:
+            self.timer.start(delay)
@@ -0,0 +1,108 @@
+import os
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+# Переменные окружения имеют приоритет над значениями из .env
+load_dotenv()
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+
+def _env_required(name: str) -> str:
+    value = os.getenv(name)
+    if value in (None, ""):
+        raise RuntimeError(f"Не задана переменная окружения {name} (см. .env.example)")
+    return value
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    # -------------------- База данных --------------------
+    database_url: str
+    db_echo: bool
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_pool_pre_ping: bool
+    # Кэши подготовленных выражений asyncpg. Пулер Neon (pgbouncer) работает
+    # в режиме транзакций, где именованные prepared statements не переживают
+    # смену серверного соединения, поэтому по умолчанию кэши отключены
+    db_statement_cache_size: int
+    db_prepared_statement_cache_size: int
+    # Учёт SQL-выражений по HTTP-запросам (заголовок Server-Timing и предупреждения),
+    # включается для разработки
+    query_stats_enabled: bool
+    query_count_warning: int
+    repeated_statement_warning: int
+
+    # -------------------- Безопасность --------------------
+    secret_key: str
+    algorithm: str
+    access_token_expire_minutes: int
+    refresh_token_expire_days: int
+    # Доверять утверждениям токена без загрузки пользователя из базы
+    auth_stateless: bool
+    # Как часто воркер догружает таблицу отозванных токенов, секунды
+    revocation_sync_interval: float
+    # Кэш проверенных JWT
+    token_cache_size: int
+    # bcrypt: стоимость хэширования и пул потоков, в котором оно выполняется
+    bcrypt_rounds: int
+    password_hash_workers: int
+    password_hash_concurrency: int
+    # Кэш пользователей, найденных по токену (get_current_user)
+    principal_cache_size: int
+    principal_cache_ttl: float
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=_env_required("DATABASE_URL"),
+            db_echo=_env_bool("DB_ECHO", False),
+            db_pool_size=_env_int("DB_POOL_SIZE", 10),
+            db_max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+            db_pool_timeout=_env_float("DB_POOL_TIMEOUT", 30.0),
+            db_pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+            db_pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+            db_statement_cache_size=_env_int("DB_STATEMENT_CACHE_SIZE", 0),
+            db_prepared_statement_cache_size=_env_int("DB_PREPARED_STATEMENT_CACHE_SIZE", 0),
+            query_stats_enabled=_env_bool("QUERY_STATS_ENABLED", False),
+            query_count_warning=_env_int("QUERY_COUNT_WARNING", 20),
+            repeated_statement_warning=_env_int("REPEATED_STATEMENT_WARNING", 5),
+            secret_key=_env_required("SECRET_KEY"),
+            algorithm=_env_str("JWT_ALGORITHM", "HS256"),
+            access_token_expire_minutes=_env_int("ACCESS_TOKEN_EXPIRE_MINUTES", 120),
+            refresh_token_expire_days=_env_int("REFRESH_TOKEN_EXPIRE_DAYS", 30),
+            auth_stateless=_env_bool("AUTH_STATELESS", False),
+            revocation_sync_interval=_env_float("REVOCATION_SYNC_INTERVAL", 5.0),
+            token_cache_size=_env_int("TOKEN_CACHE_SIZE", 4096),
+            bcrypt_rounds=_env_int("BCRYPT_ROUNDS", 12),
+            password_hash_workers=_env_int("PASSWORD_HASH_WORKERS", 4),
+            password_hash_concurrency=_env_int("PASSWORD_HASH_CONCURRENCY", 4),
+            principal_cache_size=_env_int("PRINCIPAL_CACHE_SIZE", 4096),
+            principal_cache_ttl=_env_float("PRINCIPAL_CACHE_TTL", 60.0),
+        )
+
+
+settings = Settings.from_env()
@@ -1,11 +1,14 @@
 from typing import Union, List, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from core.cache import TTLCache
+from core.config import settings
 from core.database import get_db
-from core.security import SECRET_KEY, ALGORITHM
+from core.revocation import revocation_list
+from core.security import decode_access_token
 from core.models import Employee, Customer, Supplier
 from pydantic import BaseModel
 
@@ -18,6 +21,33 @@ class TokenData(BaseModel):
     supplier_id: Optional[int] = None
     employee_id: Optional[int] = None  # Добавляем необязательное поле для employee_id
 
+ROLE_MODELS = {"admin": Employee, "customer": Customer, "supplier": Supplier}
+
+# Пользователи, уже найденные по токену, ключ — (role, username).
+# Записи сбрасываются роутерами при изменении, смене пароля и удалении
+# учётной записи; TTL ограничивает расхождение между воркерами
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl)
+
+def invalidate_principal(role: str, username: Optional[str]) -> None:
+    if username is not None:
+        principal_cache.invalidate((role, username))
+
+async def load_principal(db: AsyncSession, role: str, username: str):
+    user_model = ROLE_MODELS.get(role)
+    if user_model is None:
+        return None
+
+    user = principal_cache.get((role, username))
+    if user is None:
+        result = await db.execute(select(user_model).where(user_model.username == username))
+        user = result.scalar_one_or_none()
+        if user is not None:
+            # В кэш кладём отвязанную от сессии копию: её атрибуты не истекают
+            # при commit/rollback в других запросах
+            snapshot = user_model(**{c.key: getattr(user, c.key) for c in user_model.__table__.columns})
+            principal_cache.set((role, username), snapshot)
+    return user
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,8 +56,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Decoded token payload:", payload)  # Отладочное сообщение
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         role: str = payload.get("role")
         customer_id: Optional[int] = payload.get("customer_id")
@@ -37,31 +66,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         if username is None or role is None:
             raise credentials_exception
 
-        user = None
-        user_model = None
-
-        if role == "admin":
-            result = await db.execute(select(Employee).where(Employee.username == username))
-            user_model = Employee
-        elif role == "customer":
-            result = await db.execute(select(Customer).where(Customer.username == username))
-            user_model = Customer
-        elif role == "supplier":
-            result = await db.execute(select(Supplier).where(Supplier.username == username))
-            user_model = Supplier
-
-        user = result.scalar_one_or_none()
-
-        if user is None:
+        await revocation_list.sync(db)
+        if revocation_list.is_revoked(payload):
             raise credentials_exception
 
+        # В режиме без состояния достаточно проверенного токена; старые токены
+        # без iat по-прежнему сверяются с базой
+        if settings.auth_stateless and "iat" in payload:
+            user = None
+        else:
+            user = await load_principal(db, role, username)
+            if user is None:
+                raise credentials_exception
+
         return {
             "username": username,
             "role": role,
             "customer_id": customer_id if role == "customer" else None,
             "supplier_id": supplier_id if role == "supplier" else None,
             "employee_id": employee_id if role == "admin" else None,  # Добавляем employee_id
-            "user": user
+            "user": user,
+            "jti": payload.get("jti"),
+            "exp": payload.get("exp")
         }
 
     except JWTError:
@@ -72,7 +98,6 @@ def require_role(required_roles: Union[str, List[str]]):
         required_roles = [required_roles]
 
     async def role_dependency(current_user: dict = Depends(get_current_user)):
-        print(f"User role: {current_user['role']}, Required roles: {required_roles}")
         if current_user["role"] not in required_roles:
             raise HTTPException(status_code=403, detail="Недостаточно прав")
         return current_user
@@ -0,0 +1,53 @@
+"""
+Условные GET для справочников.
+
+ETag списка строится из счётчиков изменений таблиц (collection_versions),
+поэтому проверка If-None-Match стоит одного запроса по диапазону первичного
+ключа вместо загрузки и сериализации всего списка.
+"""
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import CollectionVersion
+
+# Клиент обязан перепроверять ответ перед использованием
+CACHE_CONTROL = "private, no-cache"
+
+
+async def collection_etag(db: AsyncSession, *names: str) -> str:
+    # Версия таблицы — сумма сегментов счётчика
+    result = await db.execute(
+        select(CollectionVersion.name, func.sum(CollectionVersion.version))
+        .where(CollectionVersion.name.in_(names))
+        .group_by(CollectionVersion.name)
+    )
+    versions = dict(result.all())
+    return 'W/"' + "-".join(f"{name}.{versions.get(name, 0)}" for name in names) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Для If-None-Match сравнение слабое: префикс W/ не учитывается
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+async def conditional_get(request: Request, response: Response, db: AsyncSession,
+                          *names: str) -> Optional[Response]:
+    """
+    Возвращает ответ 304, если у клиента актуальная версия списка;
+    иначе проставляет ETag в response и возвращает None.
+    """
+    etag = await collection_etag(db, *names)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,21 +1,32 @@
 from sqlalchemy import (
     Column,
     Integer,
+    SmallInteger,
+    BigInteger,
     String,
     Text,
     Date,
     ForeignKey,
     DECIMAL,
-    TIMESTAMP
+    TIMESTAMP,
+    UniqueConstraint,
+    PrimaryKeyConstraint,
+    Computed,
+    Index,
+    text
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 Base = declarative_base()
 
 # ---------------------- Сотрудники ----------------------
 class Employee(Base):
     __tablename__ = "employees"
+    __table_args__ = (
+        Index("ix_employees_full_name_id", "full_name", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     full_name = Column(String(100), nullable=False)
@@ -30,6 +41,9 @@ class Employee(Base):
 # ---------------------- Покупатели ----------------------
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        Index("ix_customers_full_name_id", "full_name", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     full_name = Column(String(100), nullable=False)
@@ -44,6 +58,9 @@ class Customer(Base):
 # ---------------------- Поставщики ----------------------
 class Supplier(Base):
     __tablename__ = "suppliers"
+    __table_args__ = (
+        Index("ix_suppliers_name_id", "name", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -62,7 +79,7 @@ class ProductCategory(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(50), nullable=False)
-    parent_id = Column(Integer, ForeignKey("product_category.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("product_category.id"), nullable=True, index=True)
 
     parent = relationship("ProductCategory", remote_side=[id])
 
@@ -70,6 +87,14 @@ class ProductCategory(Base):
 # ---------------------- Товары ---------------------------------
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_category_id_name_id", "category_id", "name", "id"),
+        Index("ix_products_supplier_id_name_id", "supplier_id", "name", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
@@ -79,6 +104,12 @@ class Product(Base):
     description = Column(Text)
     stock_quantity = Column(Integer, nullable=False)
 
+    # Поисковый вектор (генерируемая колонка), в обычные выборки не попадает
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('russian', coalesce(name, '') || ' ' || coalesce(description, ''))", persisted=True)
+    ))
+
     category = relationship("ProductCategory")
     supplier = relationship("Supplier")
 
@@ -86,6 +117,11 @@ class Product(Base):
 # ---------------------- Заказы ----------------------
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_customer_id_order_date", "customer_id", text("order_date DESC")),
+        Index("ix_orders_order_date_id", "order_date", "id"),
+        Index("ix_orders_status_order_date", "status", "order_date"),
+    )
 
     id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
@@ -99,6 +135,10 @@ class Order(Base):
 # ---------------------- Детали заказа ----------------------
 class OrderDetail(Base):
     __tablename__ = "order_detail"
+    __table_args__ = (
+        UniqueConstraint("order_id", "product_id", name="uq_order_detail_order_product"),
+        Index("ix_order_detail_product_id_order_id", "product_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
@@ -125,6 +165,10 @@ class Sale(Base):
 # ---------------------- Операции на складе ----------------------
 class StockOperation(Base):
     __tablename__ = "stock_operations"
+    __table_args__ = (
+        Index("ix_stock_operations_product_id_operation_date", "product_id", "operation_date"),
+        Index("ix_stock_operations_operation_date_id", "operation_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -140,9 +184,92 @@ class StockOperation(Base):
 # ---------------------- Финансовые отчёты ----------------------
 class FinancialReport(Base):
     __tablename__ = "financial_reports"
+    __table_args__ = (
+        Index("ix_financial_reports_report_date_id", "report_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     report_date = Column(Date, nullable=False)
     total_revenue = Column(DECIMAL(12, 2), nullable=False)
     total_expenses = Column(DECIMAL(12, 2), nullable=False)
     profit = Column(DECIMAL(12, 2), nullable=False)
+
+
+# ---------------------- Продажи по дням (агрегат) ----------------------
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+    __table_args__ = (
+        PrimaryKeyConstraint("day", "product_id", "supplier_id"),
+        Index("ix_daily_sales_product_id_day", "product_id", "day"),
+        Index("ix_daily_sales_supplier_id_day", "supplier_id", "day"),
+    )
+
+    day = Column(Date, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    revenue = Column(DECIMAL(12, 2), nullable=False)
+    orders_count = Column(Integer, nullable=False)
+
+    product = relationship("Product")
+    supplier = relationship("Supplier")
+
+
+# ---------------------- Отозванные токены ----------------------
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Отзыв одного токена (по jti) или всех токенов пользователя,
+    # выданных до revoked_at (удаление, смена пароля)
+    jti = Column(String(64), nullable=True)
+    role = Column(String(20), nullable=True)
+    username = Column(String(50), nullable=True)
+    revoked_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    # После этого момента все затронутые токены истекли сами, запись можно удалить
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+
+# ---------------------- Refresh-токены ----------------------
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_family_id", "family_id"),
+        Index("ix_refresh_tokens_role_username", "role", "username"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # В базе хранится только SHA-256 токена
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # Цепочка токенов одного входа: при ротации семейство сохраняется
+    family_id = Column(String(32), nullable=False)
+    role = Column(String(20), nullable=False)
+    username = Column(String(50), nullable=False)
+    account_id = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    # Заполняется при обмене на новый токен; повторное предъявление — признак кражи
+    used_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+# ---------------------- Версии справочников ----------------------
+# Число сегментов счётчика на таблицу (миграция 0006)
+COLLECTION_VERSION_SHARDS = 64
+
+class CollectionVersion(Base):
+    """
+    Счётчик изменений таблицы для ETag списков. Увеличивается триггером
+    на любую запись в таблицу (миграция 0005), поэтому учитывает и
+    изменения остатков складскими операциями. Счётчик разбит на сегменты
+    по серверному процессу (миграция 0006), чтобы параллельные изменения
+    остатков не ждали друг друга на одной строке; версия — сумма сегментов
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String(50), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Размер страницы по умолчанию и максимальный для списочных эндпоинтов
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Заголовок, в котором возвращается курсор следующей страницы. Тело ответа
+# остаётся списком, как до введения пагинации, поэтому курсор не входит в него
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _to_json(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _from_json(value: Any, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Упаковывает значения ключа (sort_key, id) в непрозрачный курсор"""
+    raw = json.dumps([_to_json(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    """Распаковывает курсор, приводя значения к типам колонок ключа"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor length mismatch")
+        return [_from_json(v, c) for v, c in zip(values, columns)]
+    except (ValueError, TypeError, InvalidOperation, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+
+def keyset_paginate(query, sort_column, id_column, limit: int, after: Optional[str],
+                    descending: bool = False):
+    """
+    Добавляет к запросу сортировку и keyset-пагинацию по ключу (sort_column, id_column):
+    не больше limit строк начиная с курсора after.
+    """
+    key = tuple_(sort_column, id_column)
+    if after is not None:
+        values = decode_cursor(after, (sort_column, id_column))
+        query = query.where(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+    return query.limit(min(limit, MAX_PAGE_SIZE) + 1)
+
+
+def keyset_page(response: Response, rows: list, limit: int,
+                key: Callable[[Any], Sequence[Any]]) -> list:
+    """
+    Обрезает выборку до limit строк и передаёт курсор следующей страницы
+    в заголовке X-Next-Cursor (на последней странице заголовок не передаётся).
+    Клиент повторяет запрос с after=<курсор>, пока заголовок есть в ответе.
+    """
+    limit = min(limit, MAX_PAGE_SIZE)
+    if len(rows) <= limit:
+        return rows
+
+    rows = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
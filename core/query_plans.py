@@ -0,0 +1,203 @@
+"""
+Проверка планов горячих запросов API.
+
+Для каждого запроса выполняется EXPLAIN; проверка завершается с ошибкой,
+если по одной из больших таблиц выбран последовательный просмотр (Seq Scan).
+
+    python -m core.query_plans            # по данным текущей базы
+    python -m core.query_plans --seed     # на синтетических данных (изменения откатываются)
+"""
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date
+
+from sqlalchemy import text, select
+from sqlalchemy.dialects import postgresql
+
+from core.database import engine
+from core.models import Order, OrderDetail, DailySales
+from core.rollup import rebuild_daily_sales
+
+# Таблицы, на которых последовательный просмотр считается регрессией
+HOT_TABLES = {"products", "orders", "order_detail", "daily_sales", "stock_operations"}
+# Запросы, которые по смыслу читают таблицы целиком: их просмотр только выводится
+FULL_SCAN_QUERIES = {"dashboard: counters"}
+
+SEED_SQL = [
+    """
+    INSERT INTO suppliers (name, phone)
+    SELECT 'Поставщик ' || g, '000' FROM generate_series(1, 100 * :scale) AS g
+    """,
+    """
+    INSERT INTO customers (full_name, phone)
+    SELECT 'Покупатель ' || g, '000' FROM generate_series(1, 5000 * :scale) AS g
+    """,
+    """
+    INSERT INTO employees (full_name, position, phone, hire_date)
+    SELECT 'Сотрудник ' || g, 'Кладовщик', '000', DATE '2020-01-01' FROM generate_series(1, 10) AS g
+    """,
+    """
+    INSERT INTO product_category (name)
+    SELECT 'Категория ' || g FROM generate_series(1, 200) AS g
+    """,
+    """
+    INSERT INTO products (name, category_id, supplier_id, price, description, stock_quantity)
+    SELECT 'Товар ' || g,
+           c.ids[1 + g % array_length(c.ids, 1)],
+           s.ids[1 + g % array_length(s.ids, 1)],
+           (g % 5000) + 0.99, 'Описание товара ' || g, g % 100
+    FROM generate_series(1, 20000 * :scale) AS g,
+         (SELECT array_agg(id) AS ids FROM product_category) AS c,
+         (SELECT array_agg(id) AS ids FROM suppliers) AS s
+    """,
+    """
+    INSERT INTO orders (customer_id, order_date, status, total_amount)
+    SELECT cu.ids[1 + g % array_length(cu.ids, 1)],
+           TIMESTAMPTZ '2024-01-01' + (g % 730) * INTERVAL '1 day' + (g % 86400) * INTERVAL '1 second',
+           (ARRAY['Оплачен', 'Доставлен', 'Завершен', 'Отменен'])[1 + g % 4],
+           100
+    FROM generate_series(1, 100000 * :scale) AS g,
+         (SELECT array_agg(id) AS ids FROM customers) AS cu
+    """,
+    """
+    INSERT INTO order_detail (order_id, product_id, quantity, price_per_unit)
+    SELECT o.id, p.ids[1 + (o.id * 7 + k) % array_length(p.ids, 1)], 1 + k, 10
+    FROM orders AS o,
+         generate_series(0, 2) AS k,
+         (SELECT array_agg(id) AS ids FROM products) AS p
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO stock_operations (product_id, operation_type, quantity, operation_date, employee_id)
+    SELECT p.ids[1 + g % array_length(p.ids, 1)], 'приход', 1 + g % 10,
+           TIMESTAMPTZ '2024-01-01' + (g % 730) * INTERVAL '1 day',
+           e.ids[1 + g % array_length(e.ids, 1)]
+    FROM generate_series(1, 50000 * :scale) AS g,
+         (SELECT array_agg(id) AS ids FROM products) AS p,
+         (SELECT array_agg(id) AS ids FROM employees) AS e
+    """,
+]
+
+
+def hot_queries():
+    """Запросы, построенные теми же функциями, что и в эндпоинтах"""
+    # Импорт здесь: роутеры тянут за собой всё приложение
+    from routers.routers import (
+        PRODUCT_SORTS, category_product_counts_query, category_products_query, category_tree_query,
+        dashboard_counts_query, financial_report_insert, financial_reports_query, order_detail_rows_query,
+        order_details_page_query, order_details_upsert_query, orders_query, product_search_query, products_query,
+        recent_orders_query, stock_operations_query, supplier_order_details_query, supplier_sales_analytics_queries,
+    )
+    from schemas import FinancialReportGenerate
+
+    start, end = date(2024, 3, 1), date(2024, 3, 31)
+    queries = {}
+
+    product_filters = {
+        "all": {},
+        "name": {"name": "товар 12"},
+        "category": {"category_id": 1},
+        "supplier": {"supplier_id": 1},
+        "price range": {"min_price": 100, "max_price": 200},
+        "in stock": {"in_stock": True},
+        "category in stock": {"category_id": 1, "in_stock": True},
+    }
+    for sort in PRODUCT_SORTS:
+        for label, filters in product_filters.items():
+            queries[f"products: {label}, sort {sort}"] = products_query(**filters, sort=sort, limit=50)
+    queries["products: search"] = product_search_query("товар 125", 20)
+    queries["products: by category subtree"] = category_products_query([1, 2, 3], 50)
+    queries["products: counts by category"] = category_product_counts_query([1, 2, 3])
+
+    queries["categories: tree"] = category_tree_query(None)
+    queries["categories: subtree"] = category_tree_query(1)
+
+    queries["orders: page by date"] = orders_query(limit=50)
+    queries["orders: by customer"] = orders_query(customer_id=1, limit=50)
+    queries["orders: status and date range"] = orders_query(status="Оплачен", start_date=start, end_date=end, limit=50)
+
+    queries["order details: page"] = order_details_page_query(50)
+    queries["order details: by order"] = order_detail_rows_query().where(OrderDetail.order_id == 1)
+    queries["order details: by customer"] = order_detail_rows_query().where(Order.customer_id == 1)
+    queries["order details: by supplier"] = supplier_order_details_query(1, start, end)
+    queries["order details: bulk upsert"] = order_details_upsert_query([
+        {"order_id": order_id, "product_id": product_id, "quantity": 1, "price_per_unit": 10}
+        for order_id in (1, 2) for product_id in (1, 2, 3)
+    ])
+
+    for period, (start_date, end_date) in {"all time": (None, None), "range": (start, end)}.items():
+        totals, by_product, by_day = supplier_sales_analytics_queries(1, start_date, end_date)
+        queries[f"supplier analytics: totals, {period}"] = totals
+        queries[f"supplier analytics: by product, {period}"] = by_product
+        queries[f"supplier analytics: by day, {period}"] = by_day
+
+    queries["daily sales: supplier range"] = select(DailySales).where(
+        DailySales.supplier_id == 1, DailySales.day >= start, DailySales.day <= end)
+    queries["reports: page"] = financial_reports_query(50)
+    queries["reports: generate"] = financial_report_insert(FinancialReportGenerate(start_date=start, end_date=end))
+
+    queries["dashboard: counters"] = dashboard_counts_query()
+    queries["dashboard: recent orders"] = recent_orders_query(10)
+
+    queries["stock operations: page"] = stock_operations_query(limit=50)
+    queries["stock operations: by product"] = stock_operations_query(1, 50)
+    return queries
+
+
+def find_seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+async def check_plans(conn) -> list[str]:
+    failures = []
+    for name, query in hot_queries().items():
+        sql = str(query.compile(dialect=postgresql.asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        seq_scans = find_seq_scans(plan[0]["Plan"])
+        status = "SEQ SCAN: " + ", ".join(seq_scans) if seq_scans else "ok"
+        if seq_scans and name in FULL_SCAN_QUERIES:
+            status += " (ожидаемо)"
+        print(f"{name:48} {status}")
+        if seq_scans and name not in FULL_SCAN_QUERIES:
+            failures.append(name)
+    return failures
+
+
+async def main(seed: bool, scale: int) -> int:
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            if seed:
+                for statement in SEED_SQL:
+                    await conn.execute(text(statement), {"scale": scale})
+                await rebuild_daily_sales(conn)
+                for table in sorted(HOT_TABLES | {"customers", "suppliers", "product_category"}):
+                    await conn.execute(text(f"ANALYZE {table}"))
+            failures = await check_plans(conn)
+        finally:
+            # Проверка ничего не оставляет в базе
+            await transaction.rollback()
+    await engine.dispose()
+
+    if failures:
+        print(f"Последовательный просмотр в горячих запросах: {len(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка планов горячих запросов")
+    parser.add_argument("--seed", action="store_true", help="засеять синтетические данные перед проверкой")
+    parser.add_argument("--scale", type=int, default=1, help="множитель объёма синтетических данных")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.seed, args.scale)))
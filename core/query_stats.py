@@ -0,0 +1,113 @@
+"""
+Учёт SQL-запросов в пределах HTTP-запроса.
+
+Обработчики событий движка считают выполненные выражения и время в базе;
+QueryStatsMiddleware отдаёт итог в заголовке Server-Timing и пишет
+предупреждение в лог, если запрос выполнил слишком много выражений или
+повторял одно и то же выражение в цикле (признак N+1).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from core.config import settings
+from core.database import engine
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+# Один или несколько параметров подряд, каждый с необязательным приведением
+# типа asyncpg: $1::INTEGER, $2::TIMESTAMP WITH TIME ZONE, $3::NUMERIC(10, 2), $4::VARCHAR[]
+_CAST = r"(?:::\w+(?:\s+WITH(?:OUT)?\s+TIME\s+ZONE)?(?:\(\d+(?:\s*,\s*\d+)?\))?(?:\[\])*)?"
+_PLACEHOLDER_LIST = re.compile(rf"\?{_CAST}(?:\s*,\s*\?{_CAST})*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Текст выражения без параметров: IN (?, ?, ?) и IN (?) дают одну форму"""
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(exception_context):
+    # Упавшее выражение не доходит до after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+def _warn(scope, stats: RequestQueryStats) -> None:
+    route = getattr(scope.get("route"), "path", scope["path"])
+    if stats.count > settings.query_count_warning:
+        logger.warning("%s %s: выполнено %d SQL-выражений за %.1f мс",
+                       scope["method"], route, stats.count, stats.duration * 1000)
+
+    for shape, count in stats.shapes.most_common():
+        if count <= settings.repeated_statement_warning:
+            break
+        logger.warning("%s %s: одно и то же выражение выполнено %d раз (возможен N+1): %s",
+                       scope["method"], route, count, shape[:200])
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            _warn(scope, stats)
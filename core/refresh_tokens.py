@@ -0,0 +1,81 @@
+"""
+Refresh-токены с ротацией.
+
+Клиент получает refresh-токен при входе и обменивает его на новую пару
+токенов без повторной проверки пароля. Каждый refresh-токен одноразовый:
+повторное предъявление уже использованного токена отзывает всё семейство
+(цепочку токенов, начатую одним входом).
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.models import RefreshToken
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(db: AsyncSession, role: str, username: str, account_id: int,
+                              family_id: Optional[str] = None) -> str:
+    """Создаёт refresh-токен. Фиксация транзакции — на вызывающей стороне"""
+    now = datetime.now(timezone.utc)
+    token = secrets.token_urlsafe(32)
+    await db.execute(
+        insert(RefreshToken).values(
+            token_hash=_digest(token),
+            family_id=family_id or uuid4().hex,
+            role=role,
+            username=username,
+            account_id=account_id,
+            created_at=now,
+            expires_at=now + timedelta(days=settings.refresh_token_expire_days)
+        )
+    )
+    # Попутно чистим истёкшие токены
+    await db.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+    return token
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[tuple[RefreshToken, str]]:
+    """
+    Обменивает refresh-токен на новый из того же семейства.
+    Возвращает (использованная запись, новый токен) или None, если токен
+    недействителен. Фиксация транзакции — на вызывающей стороне.
+    """
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == _digest(token)).with_for_update()
+    )
+    row = result.scalar_one_or_none()
+    if row is None or row.expires_at <= now:
+        return None
+
+    if row.used_at is not None:
+        # Токен уже обменян — вероятно, он утёк: отзываем всю цепочку
+        await db.execute(delete(RefreshToken).where(RefreshToken.family_id == row.family_id))
+        return None
+
+    row.used_at = now
+    new_token = await issue_refresh_token(db, row.role, row.username, row.account_id, row.family_id)
+    return row, new_token
+
+
+async def revoke_refresh_family(db: AsyncSession, token: str) -> None:
+    """Отзывает цепочку, к которой относится токен (выход с устройства)"""
+    family_id = select(RefreshToken.family_id).where(RefreshToken.token_hash == _digest(token)).scalar_subquery()
+    await db.execute(delete(RefreshToken).where(RefreshToken.family_id == family_id))
+
+
+async def revoke_refresh_tokens(db: AsyncSession, role: str, username: str) -> None:
+    """Отзывает все refresh-токены пользователя (удаление, смена пароля)"""
+    await db.execute(
+        delete(RefreshToken).where(RefreshToken.role == role, RefreshToken.username == username)
+    )
@@ -0,0 +1,119 @@
+"""
+Отзыв токенов доступа.
+
+Отзывы хранятся в небольшой таблице revoked_tokens. Каждый воркер держит её
+копию в памяти и раз в settings.revocation_sync_interval секунд перечитывает
+неистёкшие строки целиком, поэтому проверка токена обычно не обращается
+к базе. Собственные отзывы воркера попадают в память только после фиксации
+транзакции, в которой они записаны.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import RevokedToken
+from core.refresh_tokens import revoke_refresh_tokens
+
+
+class RevocationList:
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._jtis: dict[str, float] = {}
+        self._principals: dict[tuple[str, str], tuple[float, float]] = {}
+        self._synced_at: Optional[float] = None
+
+    def _add(self, row) -> None:
+        expires_at = row.expires_at.timestamp()
+        if row.jti is not None:
+            self._jtis[row.jti] = expires_at
+        if row.role is not None and row.username is not None:
+            key = (row.role, row.username)
+            revoked_at = row.revoked_at.timestamp()
+            previous = self._principals.get(key)
+            if previous is None or previous[0] < revoked_at:
+                self._principals[key] = (revoked_at, expires_at)
+
+    def _prune(self) -> None:
+        now = time.time()
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        self._principals = {key: value for key, value in self._principals.items() if value[1] > now}
+
+    async def sync(self, db: AsyncSession, force: bool = False) -> None:
+        """
+        Перечитывает отзывы, сделанные другими воркерами. Таблица небольшая
+        (истёкшие строки удаляются), поэтому она загружается целиком: догрузка
+        по id > последнего пропускала бы строки, зафиксированные не в порядке id
+        """
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+
+        result = await db.execute(
+            select(RevokedToken).where(RevokedToken.expires_at > datetime.now(timezone.utc))
+        )
+        rows = result.scalars().all()
+        self._jtis = {}
+        self._principals = {}
+        for row in rows:
+            self._add(row)
+        self._prune()
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti is not None and jti in self._jtis:
+            return True
+
+        revoked = self._principals.get((payload.get("role"), payload.get("sub")))
+        if revoked is None:
+            return False
+        # Токены без iat выпущены до появления отзыва — считаем их отозванными.
+        # iat хранится в целых секундах: токен, выданный в ту же секунду сразу
+        # после отзыва (повторный вход), остаётся действительным
+        issued_at = payload.get("iat")
+        return issued_at is None or issued_at < int(revoked[0])
+
+    async def _store(self, db: AsyncSession, **values) -> None:
+        now = datetime.now(timezone.utc)
+        values.setdefault("expires_at", now + timedelta(minutes=settings.access_token_expire_minutes))
+        result = await db.execute(
+            insert(RevokedToken).values(revoked_at=now, **values).returning(*RevokedToken.__table__.c)
+        )
+        # В память — только после фиксации транзакции (см. _apply_committed)
+        db.info.setdefault(_PENDING_KEY, []).append(result.one())
+        # Попутно чистим таблицу от записей об истёкших токенах
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+
+    async def revoke_token(self, db: AsyncSession, jti: str, expires_at: datetime) -> None:
+        """Отзывает один токен. Фиксация транзакции — на вызывающей стороне"""
+        await self._store(db, jti=jti, expires_at=expires_at)
+
+    async def revoke_principal(self, db: AsyncSession, role: str, username: Optional[str]) -> None:
+        """
+        Отзывает все выданные пользователю токены доступа и refresh-токены.
+        Фиксация транзакции — на вызывающей стороне
+        """
+        if username is not None:
+            await self._store(db, role=role, username=username)
+            await revoke_refresh_tokens(db, role, username)
+
+
+revocation_list = RevocationList(sync_interval=settings.revocation_sync_interval)
+
+_PENDING_KEY = "pending_revocations"
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    for row in session.info.pop(_PENDING_KEY, ()):
+        revocation_list._add(row)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
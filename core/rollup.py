@@ -0,0 +1,155 @@
+"""
+Агрегат daily_sales: продажи по дням, товарам и поставщикам.
+
+Строки агрегата пересчитываются в той же транзакции, что и запись заказа
+или позиции заказа, но только для затронутых пар (день, товар).
+Пересчёт каждой пары сериализуется транзакционной advisory-блокировкой:
+конкурирующая транзакция ждёт коммита первой и затем (READ COMMITTED)
+видит её позиции, поэтому агрегат не теряет обновлений.
+Полная перестройка (и создание таблицы при её отсутствии):
+
+    python -m core.rollup [--start-date YYYY-MM-DD] [--end-date YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import Date, Text, bindparam, cast, delete, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import async_session, engine
+from core.models import DailySales, Order, OrderDetail, Product
+
+# День заказа в часовом поясе сессии PostgreSQL
+order_day = cast(Order.order_date, Date)
+
+_LOCK_KEYS = text(
+    "SELECT pg_advisory_xact_lock(hashtext(k)) FROM unnest(CAST(:keys AS text[])) AS k ORDER BY k"
+).bindparams(bindparam("keys", type_=ARRAY(Text)))
+
+
+def _aggregate_query():
+    return (
+        select(
+            order_day.label("day"),
+            OrderDetail.product_id,
+            Product.supplier_id,
+            func.sum(OrderDetail.quantity).label("quantity"),
+            func.sum(OrderDetail.quantity * OrderDetail.price_per_unit).label("revenue"),
+            func.count(OrderDetail.order_id.distinct()).label("orders_count")
+        )
+        .select_from(OrderDetail)
+        .join(Order, OrderDetail.order_id == Order.id)
+        .join(Product, OrderDetail.product_id == Product.id)
+        .group_by(order_day, OrderDetail.product_id, Product.supplier_id)
+    )
+
+
+async def _upsert_from(db: AsyncSession, query) -> int:
+    stmt = pg_insert(DailySales).from_select(
+        ["day", "product_id", "supplier_id", "quantity", "revenue", "orders_count"],
+        query
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySales.day, DailySales.product_id, DailySales.supplier_id],
+        set_={
+            "quantity": stmt.excluded.quantity,
+            "revenue": stmt.excluded.revenue,
+            "orders_count": stmt.excluded.orders_count
+        }
+    )
+    result = await db.execute(stmt)
+    return result.rowcount
+
+
+async def collect_daily_sales_keys(db: AsyncSession, order_ids: Iterable[int]) -> set[tuple[date, int]]:
+    """Возвращает пары (день, товар), которых касаются позиции указанных заказов"""
+    order_ids = set(order_ids)
+    if not order_ids:
+        return set()
+
+    result = await db.execute(
+        select(order_day, OrderDetail.product_id)
+        .distinct()
+        .join(Order, OrderDetail.order_id == Order.id)
+        .where(OrderDetail.order_id.in_(order_ids))
+    )
+    return {(row[0], row[1]) for row in result.all()}
+
+
+async def refresh_daily_sales(db: AsyncSession, keys: Iterable[tuple[date, int]]) -> None:
+    """Пересчитывает строки агрегата для пар (день, товар) в текущей транзакции"""
+    keys = list(set(keys))
+    if not keys:
+        return
+
+    # Все блокировки — одним оператором и в одном порядке во всех транзакциях
+    # (без взаимоблокировок): PostgreSQL вычисляет изменчивые функции списка
+    # SELECT после сортировки
+    await db.execute(
+        _LOCK_KEYS,
+        {"keys": [f"daily_sales:{day.isoformat()}:{product_id}" for day, product_id in keys]}
+    )
+
+    await db.execute(
+        delete(DailySales).where(tuple_(DailySales.day, DailySales.product_id).in_(keys))
+    )
+
+    days = [day for day, _ in keys]
+    product_ids = {product_id for _, product_id in keys}
+    await _upsert_from(
+        db,
+        _aggregate_query().where(
+            OrderDetail.product_id.in_(product_ids),
+            Order.order_date >= min(days) - timedelta(days=1),
+            Order.order_date < max(days) + timedelta(days=2),
+            tuple_(order_day, OrderDetail.product_id).in_(keys)
+        )
+    )
+
+
+async def refresh_daily_sales_for_orders(db: AsyncSession, order_ids: Iterable[int],
+                                         previous_keys: Iterable[tuple[date, int]] = ()) -> None:
+    """
+    Обновляет агрегат после записи заказов. previous_keys — пары, собранные
+    до изменения (нужны, если у заказа сменилась дата или удалились позиции).
+    """
+    keys = set(previous_keys) | await collect_daily_sales_keys(db, order_ids)
+    await refresh_daily_sales(db, keys)
+
+
+async def rebuild_daily_sales(db: AsyncSession, start_date: Optional[date] = None,
+                              end_date: Optional[date] = None) -> int:
+    """Полностью перестраивает агрегат (или его часть за период)"""
+    delete_stmt = delete(DailySales)
+    query = _aggregate_query()
+    if start_date:
+        delete_stmt = delete_stmt.where(DailySales.day >= start_date)
+        query = query.where(order_day >= start_date)
+    if end_date:
+        delete_stmt = delete_stmt.where(DailySales.day <= end_date)
+        query = query.where(order_day <= end_date)
+
+    await db.execute(delete_stmt)
+    return await _upsert_from(db, query)
+
+
+async def main(start_date: Optional[date], end_date: Optional[date]) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(DailySales.__table__.create, checkfirst=True)
+
+    async with async_session() as db:
+        rows = await rebuild_daily_sales(db, start_date, end_date)
+        await db.commit()
+    await engine.dispose()
+    print(f"daily_sales: записано строк — {rows}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перестроение агрегата daily_sales")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.start_date, args.end_date))
@@ -0,0 +1,47 @@
+"""
+Полнотекстовый и триграммный поиск по товарам.
+
+Установка поисковой колонки и индексов в существующую базу:
+
+    python -m core.search
+"""
+import asyncio
+
+from sqlalchemy import Float, func, literal_column, or_, text
+
+from core.database import engine
+from core.models import Product
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = "russian"
+
+SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(name, '') || ' ' || coalesce(description, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+
+def search_condition_and_rank(q: str):
+    """
+    Условие отбора и ранг для строки поиска: совпадение по tsvector
+    (GIN-индекс) или нечёткое совпадение названия по триграммам (pg_trgm).
+    """
+    ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), q)
+    condition = or_(Product.search_vector.op("@@")(ts_query), Product.name.op("%")(q))
+    rank = (func.ts_rank_cd(Product.search_vector, ts_query) + func.similarity(Product.name, q)).cast(Float)
+    return condition, rank
+
+
+async def main() -> None:
+    async with engine.begin() as conn:
+        for statement in SEARCH_DDL:
+            await conn.execute(text(statement))
+    await engine.dispose()
+    print("Поисковые индексы товаров установлены")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,46 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 from typing import Optional
+from uuid import uuid4
+
+from core.cache import TTLCache
+from core.config import settings
 
 # Настройки безопасности
-SECRET_KEY = "your-secret-key"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 120
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+
+# min/max совпадают с default: хэш другой стоимости считается устаревшим
+# и пересчитывается при следующем успешном входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt занимает CPU на 100–300 мс и блокировал бы цикл событий uvicorn,
+# поэтому хэширование идёт в отдельном пуле потоков с ограничением параллелизма
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash"
+)
+_hash_semaphore = asyncio.Semaphore(settings.password_hash_concurrency)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Метрики очереди хэширования
+password_hash_stats = {
+    "waiting": 0,        # ждут свободного слота
+    "in_flight": 0,      # выполняются в пуле
+    "max_waiting": 0,    # максимальная глубина очереди
+    "completed": 0,
+}
 
 class TokenData(BaseModel):
     id: int
@@ -25,8 +56,50 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_hashing(func, *args):
+    # В очередь попадают только запросы, не заставшие свободного слота
+    queued = _hash_semaphore.locked()
+    if queued:
+        password_hash_stats["waiting"] += 1
+        password_hash_stats["max_waiting"] = max(password_hash_stats["max_waiting"], password_hash_stats["waiting"])
+    try:
+        await _hash_semaphore.acquire()
+    finally:
+        if queued:
+            password_hash_stats["waiting"] -= 1
+
+    password_hash_stats["in_flight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        password_hash_stats["in_flight"] -= 1
+        password_hash_stats["completed"] += 1
+        _hash_semaphore.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(hash_password, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль вне цикла событий. Вторым элементом возвращает новый хэш,
+    если сохранённый посчитан с другой стоимостью (иначе None).
+    """
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def set_password(principal, plain_password: str) -> bool:
+    """
+    Записывает principal.password_hash для нового пароля. Возвращает True,
+    если пароль сменился (совпадающий пароль лишь перехэшируется при смене стоимости).
+    """
+    matches, new_hash = await verify_and_update_password(plain_password, principal.password_hash)
+    if matches:
+        if new_hash:
+            principal.password_hash = new_hash
+        return False
+    principal.password_hash = await hash_password_async(plain_password)
+    return True
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
-    print("Data before encoding:", data)  # Отладочное сообщение
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -36,6 +109,24 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     if data.get("role") == "admin" and "employee_id" in data:
         to_encode.update({"employee_id": data["employee_id"]})
 
-    to_encode.update({"exp": expire})
+    # jti позволяет отозвать отдельный токен, iat — все токены, выданные до отзыва
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+# Проверенные утверждения токенов: клиенты присылают один и тот же токен
+# тысячи раз за смену, и повторная проверка подписи не нужна.
+# Ключ — SHA-256 токена, запись живёт не дольше срока действия токена
+token_claims_cache = TTLCache(maxsize=settings.token_cache_size, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_access_token(token: str) -> dict:
+    """Проверяет токен (или берёт результат из кэша). Ошибки — JWTError, как у jwt.decode"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_claims_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        ttl = exp - time.time() if exp is not None else None
+        if ttl is None or ttl > 0:
+            token_claims_cache.set(key, payload, ttl=ttl)
+    return dict(payload)
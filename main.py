@@ -1,8 +1,14 @@
 import uvicorn
 from fastapi import FastAPI
+from core.config import settings
+from core.metrics import MetricsMiddleware
+from core.query_stats import QueryStatsMiddleware
 from routers import auth, routers
 
 app = FastAPI()
+if settings.query_stats_enabled:
+    app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(auth.router)
 app.include_router(routers.customer_router)
 app.include_router(routers.employee_router)
@@ -11,6 +17,10 @@ app.include_router(routers.product_category_router)
 app.include_router(routers.product_router)
 app.include_router(routers.order_router)
 app.include_router(routers.order_detail_router)
+app.include_router(routers.stock_operation_router)
+app.include_router(routers.financial_report_router)
+app.include_router(routers.dashboard_router)
+app.include_router(routers.metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run('main:app', port=8000)
\ No newline at end of file
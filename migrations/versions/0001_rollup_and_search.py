@@ -0,0 +1,98 @@
+"""order_detail unique lines, daily_sales rollup, product search
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Повторяющиеся позиции заказа объединяем в одну перед созданием уникального ключа.
+    # Объединяются только позиции с одинаковой ценой: иначе изменилась бы
+    # историческая выручка заказа, такие позиции нужно разобрать вручную
+    if not op.get_context().as_sql:
+        conflicts = op.get_bind().execute(sa.text("""
+            SELECT order_id, product_id
+            FROM order_detail
+            GROUP BY order_id, product_id
+            HAVING count(DISTINCT price_per_unit) > 1
+            ORDER BY order_id, product_id
+            LIMIT 20
+        """)).all()
+        if conflicts:
+            pairs = ", ".join(f"({row.order_id}, {row.product_id})" for row in conflicts)
+            raise RuntimeError(
+                "order_detail: повторяющиеся позиции с разной ценой, объедините их вручную "
+                f"перед миграцией. (order_id, product_id): {pairs}"
+            )
+
+    op.execute("""
+        UPDATE order_detail AS keep
+        SET quantity = dup.quantity
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS quantity
+            FROM order_detail
+            GROUP BY order_id, product_id, price_per_unit
+            HAVING count(*) > 1
+        ) AS dup
+        WHERE keep.id = dup.id
+    """)
+    op.execute("""
+        DELETE FROM order_detail AS d
+        USING order_detail AS keep
+        WHERE d.order_id = keep.order_id
+          AND d.product_id = keep.product_id
+          AND d.price_per_unit = keep.price_per_unit
+          AND d.id > keep.id
+    """)
+    op.create_unique_constraint("uq_order_detail_order_product", "order_detail", ["order_id", "product_id"])
+
+    # Агрегат продаж по дням (таблица могла быть создана командой python -m core.rollup)
+    if op.get_context().as_sql or not sa.inspect(op.get_bind()).has_table("daily_sales"):
+        op.create_table(
+            "daily_sales",
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+            sa.Column("supplier_id", sa.Integer(), sa.ForeignKey("suppliers.id"), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("revenue", sa.DECIMAL(12, 2), nullable=False),
+            sa.Column("orders_count", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("day", "product_id", "supplier_id"),
+        )
+    op.execute("""
+        INSERT INTO daily_sales (day, product_id, supplier_id, quantity, revenue, orders_count)
+        SELECT CAST(o.order_date AS DATE), d.product_id, p.supplier_id,
+               sum(d.quantity), sum(d.quantity * d.price_per_unit), count(DISTINCT d.order_id)
+        FROM order_detail AS d
+        JOIN orders AS o ON o.id = d.order_id
+        JOIN products AS p ON p.id = d.product_id
+        GROUP BY 1, 2, 3
+        ON CONFLICT DO NOTHING
+    """)
+
+    # Полнотекстовый и триграммный поиск по товарам
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(name, '') || ' ' || coalesce(description, ''))) STORED"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_vector")
+    op.drop_table("daily_sales")
+    op.drop_constraint("uq_order_detail_order_product", "order_detail", type_="unique")
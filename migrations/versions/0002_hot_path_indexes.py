@@ -0,0 +1,60 @@
+"""indexes for hot access paths
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки, параметры) — в том же виде, что и в core/models.py
+INDEXES = [
+    # Keyset-пагинация списков
+    ("ix_customers_full_name_id", "customers", ["full_name", "id"], {}),
+    ("ix_employees_full_name_id", "employees", ["full_name", "id"], {}),
+    ("ix_suppliers_name_id", "suppliers", ["name", "id"], {}),
+    ("ix_products_name_id", "products", ["name", "id"], {}),
+    ("ix_products_price_id", "products", ["price", "id"], {}),
+    ("ix_orders_order_date_id", "orders", ["order_date", "id"], {}),
+    ("ix_stock_operations_operation_date_id", "stock_operations", ["operation_date", "id"], {}),
+    ("ix_financial_reports_report_date_id", "financial_reports", ["report_date", "id"], {}),
+    # Внешние ключи и фильтры
+    ("ix_product_category_parent_id", "product_category", ["parent_id"], {}),
+    ("ix_products_category_id_name_id", "products", ["category_id", "name", "id"], {}),
+    ("ix_products_supplier_id_name_id", "products", ["supplier_id", "name", "id"], {}),
+    ("ix_orders_customer_id_order_date", "orders", ["customer_id", sa.text("order_date DESC")], {}),
+    ("ix_orders_status_order_date", "orders", ["status", "order_date"], {}),
+    ("ix_order_detail_product_id_order_id", "order_detail", ["product_id", "order_id"], {}),
+    ("ix_stock_operations_product_id_operation_date", "stock_operations", ["product_id", "operation_date"], {}),
+    ("ix_daily_sales_product_id_day", "daily_sales", ["product_id", "day"], {}),
+    ("ix_daily_sales_supplier_id_day", "daily_sales", ["supplier_id", "day"], {}),
+    # Поиск по товарам
+    ("ix_products_search_vector", "products", ["search_vector"], {"postgresql_using": "gin"}),
+    ("ix_products_name_trgm", "products", ["name"],
+     {"postgresql_using": "gin", "postgresql_ops": {"name": "gin_trgm_ops"}}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в большие таблицы, но требует работы вне транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,72 @@
+"""shard collection version counters
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Должно совпадать с core.models.COLLECTION_VERSION_SHARDS
+SHARDS = 64
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Одна строка счётчика на таблицу держала блокировку до конца каждой
+    # пишущей транзакции, и все изменения остатков (складские операции,
+    # PATCH .../stock) выстраивались в очередь.
+    # Счётчик разбит на сегменты: транзакция увеличивает сегмент своего
+    # серверного процесса, версия таблицы — сумма сегментов
+    op.add_column(
+        "collection_versions",
+        sa.Column("shard", sa.SmallInteger(), nullable=False, server_default="0"),
+    )
+    op.drop_constraint("collection_versions_pkey", "collection_versions", type_="primary")
+    op.create_primary_key("collection_versions_pkey", "collection_versions", ["name", "shard"])
+    op.execute(f"""
+        INSERT INTO collection_versions (name, shard, version)
+        SELECT cv.name, g.shard, 0
+        FROM collection_versions AS cv, generate_series(1, {SHARDS - 1}) AS g(shard)
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION bump_collection_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE collection_versions SET version = version + 1
+            WHERE name = TG_TABLE_NAME AND shard = mod(pg_backend_pid(), {SHARDS});
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_collection_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE collection_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        UPDATE collection_versions AS v
+        SET version = totals.version
+        FROM (SELECT name, sum(version) AS version FROM collection_versions GROUP BY name) AS totals
+        WHERE v.name = totals.name AND v.shard = 0
+    """)
+    op.execute("DELETE FROM collection_versions WHERE shard <> 0")
+    op.drop_constraint("collection_versions_pkey", "collection_versions", type_="primary")
+    op.create_primary_key("collection_versions_pkey", "collection_versions", ["name"])
+    op.drop_column("collection_versions", "shard")
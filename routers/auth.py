@@ -1,17 +1,26 @@
+from datetime import datetime, timezone
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import literal, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
 
-from core.dependencies import get_current_user
+from core.dependencies import get_current_user, invalidate_principal
 from core.models import Employee, Customer, Supplier
 from core.database import get_db
-from core.security import verify_password, create_access_token
-from schemas import TokenResponse
+from core.revocation import revocation_list
+from core.refresh_tokens import issue_refresh_token, revoke_refresh_family, rotate_refresh_token
+from core.security import ACCESS_TOKEN_EXPIRE_MINUTES, verify_and_update_password, create_access_token
+from schemas import RefreshTokenRequest, TokenResponse
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Роли в порядке приоритета при совпадении логинов
+LOGIN_ROLES = [("admin", Employee), ("customer", Customer), ("supplier", Supplier)]
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 class TokenData(BaseModel):
@@ -27,59 +36,119 @@ class UserMeResponse(BaseModel):
     role: str
 
 
+def token_claims(role: str, username: str, account_id: int) -> dict:
+    # Создаем данные для токена
+    token_data = {"sub": username, "role": role}
+
+    # Добавляем ID в зависимости от роли
+    if role == "admin":
+        token_data["employee_id"] = account_id
+    elif role == "customer":
+        token_data["customer_id"] = account_id
+    elif role == "supplier":
+        token_data["supplier_id"] = account_id
+    return token_data
+
+
+async def issue_tokens(db: AsyncSession, role: str, username: str, account_id: int) -> dict:
+    """Пара токенов после входа по паролю. Фиксация транзакции — на вызывающей стороне"""
+    return {
+        "access_token": create_access_token(token_claims(role, username, account_id)),
+        "token_type": "bearer",
+        "refresh_token": await issue_refresh_token(db, role, username, account_id),
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(
         form_data: OAuth2PasswordRequestForm = Depends(),
         db: AsyncSession = Depends(get_db)
 ):
-    user = None
-    role = None
-    customer_id = None
-    supplier_id = None  # Добавляем переменную для supplier_id
-
-    # Поиск в employees
-    result = await db.execute(select(Employee).where(Employee.username == form_data.username))
-    employee = result.scalar_one_or_none()
-    if employee and verify_password(form_data.password, employee.password_hash):
-        user = employee
-        role = "admin"
-    else:
-        # Поиск в customers
-        result = await db.execute(select(Customer).where(Customer.username == form_data.username))
-        customer = result.scalar_one_or_none()
-        if customer and verify_password(form_data.password, customer.password_hash):
-            user = customer
-            role = "customer"
-            customer_id = customer.id
-        else:
-            # Поиск в suppliers
-            result = await db.execute(select(Supplier).where(Supplier.username == form_data.username))
-            supplier = result.scalar_one_or_none()
-            if supplier and verify_password(form_data.password, supplier.password_hash):
-                user = supplier
-                role = "supplier"
-                supplier_id = supplier.id  # Сохраняем supplier_id
-
-    if not user or not role:
+    # Учётные записи всех ролей одним запросом; при совпадении логина
+    # в нескольких таблицах приоритет как раньше: сотрудник, покупатель, поставщик
+    accounts = union_all(
+        *(
+            select(
+                literal(role).label("role"),
+                literal(priority).label("priority"),
+                model.id.label("id"),
+                model.password_hash.label("password_hash")
+            ).where(model.username == form_data.username, model.password_hash.isnot(None))
+            for priority, (role, model) in enumerate(LOGIN_ROLES)
+        )
+    ).subquery()
+    result = await db.execute(
+        select(accounts.c.role, accounts.c.id, accounts.c.password_hash)
+        .order_by(accounts.c.priority)
+        .limit(1)
+    )
+    account = result.first()
+
+    # Не более одной проверки bcrypt на вход
+    valid, new_hash = False, None
+    if account is not None:
+        valid, new_hash = await verify_and_update_password(form_data.password, account.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Создаем данные для токена
-    token_data = {"sub": form_data.username, "role": role}
+    role = account.role
+
+    # Стоимость bcrypt изменилась в настройках — сохраняем пересчитанный хэш
+    if new_hash is not None:
+        model = dict(LOGIN_ROLES)[role]
+        await db.execute(update(model).where(model.id == account.id).values(password_hash=new_hash))
+        invalidate_principal(role, form_data.username)
+
+    tokens = await issue_tokens(db, role, form_data.username, account.id)
+    await db.commit()
+    return tokens
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(
+        data: RefreshTokenRequest,
+        db: AsyncSession = Depends(get_db)
+):
+    rotated = await rotate_refresh_token(db, data.refresh_token)
+    # Фиксируем и отказ: при повторном предъявлении токена семейство уже удалено
+    await db.commit()
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh-токен недействителен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    used, refresh_token = rotated
+    return {
+        "access_token": create_access_token(token_claims(used.role, used.username, used.account_id)),
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
 
-    # Добавляем ID в зависимости от роли
-    if role == "admin":
-        token_data["employee_id"] = user.id
-    elif role == "customer":
-        token_data["customer_id"] = customer_id
-    elif role == "supplier":
-        token_data["supplier_id"] = supplier_id
 
-    token = create_access_token(token_data)
-    return {"access_token": token, "token_type": "bearer"}
+@router.post("/logout")
+async def logout(
+        data: Optional[RefreshTokenRequest] = None,
+        current_user: dict = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    if current_user.get("jti") is None:
+        raise HTTPException(status_code=400, detail="Токен не поддерживает отзыв")
+
+    expires_at = datetime.fromtimestamp(current_user["exp"], timezone.utc)
+    await revocation_list.revoke_token(db, current_user["jti"], expires_at)
+    # Вместе с токеном доступа завершаем и сессию устройства
+    if data is not None:
+        await revoke_refresh_family(db, data.refresh_token)
+    await db.commit()
+    return {"detail": "Токен отозван"}
 
 
 @router.get("/me", response_model=UserMeResponse)
@@ -1,33 +1,56 @@
+import asyncio
 import datetime
 from datetime import date, timedelta
-
-from fastapi import APIRouter, HTTPException, Depends
+from decimal import Decimal
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import Date, Integer, Text, cast, column, func, insert, literal, literal_column, update, values
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from sqlalchemy.future import select
 
-from core.dependencies import require_role
+from core.dependencies import invalidate_principal, principal_cache, require_role
 from core.models import Product, Order, OrderDetail, StockOperation, Sale, FinancialReport, ProductCategory, Supplier, \
-    Employee, Customer
+    Employee, Customer, DailySales
 from schemas import (
-    ProductCreate, ProductOut,
-    OrderCreate, OrderOut,
+    ProductCreate, ProductUpdate, ProductOut, ProductStockUpdate, ProductStockBatchItem, ProductStockOut,
+    CategoryProductsOut, CategoryFacetOut,
+    OrderCreate, OrderOut, OrderCheckoutCreate, OrderCheckoutOut,
     OrderDetailCreate, OrderDetailOut,
-    ProductCategoryOut, ProductCategoryCreate, ProductCategoryUpdate, SupplierCreate, SupplierOut, EmployeeCreate,
-    EmployeeOut, CustomerCreate, CustomerOut, SupplierBase, OrderDetailSupplierOut
+    ProductCategoryOut, ProductCategoryTreeOut, ProductCategoryCreate, ProductCategoryUpdate, SupplierCreate, SupplierOut, EmployeeCreate,
+    EmployeeOut, CustomerCreate, CustomerOut, SupplierBase, OrderDetailSupplierOut,
+    SupplierSalesAnalyticsOut, SupplierProductSalesOut, SupplierDailySalesOut, DashboardSummaryOut,
+    FinancialReportGenerate, FinancialReportOut, StockOperationCreate, StockOperationOut, StockOperationResult
 )
-from core.database import get_db
-from core.security import TokenData, hash_password
+from core.cache import TTLCache
+from core.database import engine, get_db
+from core.etag import conditional_get
+from core.metrics import Counter, Gauge, render_metrics
+from core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_paginate, keyset_page
+from core.revocation import revocation_list
+from core.rollup import collect_daily_sales_keys, refresh_daily_sales_for_orders
+from core.search import search_condition_and_rank
+from core.security import TokenData, hash_password_async, password_hash_stats, set_password, token_claims_cache
 
 # -------------------- CUSTOMERS --------------------
 customer_router = APIRouter(prefix="/customers", tags=["Customers"])
 
 @customer_router.get("/", response_model=list[CustomerOut])
 async def get_customers(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role("admin"))
 ):
-    result = await db.execute(select(Customer))
-    return result.scalars().all()
+    query = keyset_paginate(select(Customer), Customer.full_name, Customer.id, limit, after)
+    result = await db.execute(query)
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.full_name, row.id))
 
 @customer_router.get("/{customer_id}", response_model=CustomerOut)
 async def get_customer(
@@ -51,7 +74,7 @@ async def create_customer(
         email=data.email,
         address=data.address,
         username=data.username,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password_async(data.password)
     )
     db.add(new_customer)
     await db.commit()
@@ -70,12 +93,14 @@ async def update_customer(
         raise HTTPException(status_code=404, detail="Покупатель не найден")
 
     for key, value in data.dict().items():
-        if key == "password":
-            setattr(customer, "password_hash", hash_password(value))
-        elif key != "username":
+        if key not in ["password", "username"]:
             setattr(customer, key, value)
 
+    # Токены отзываются, только если пароль действительно сменился
+    if await set_password(customer, data.password):
+        await revocation_list.revoke_principal(db, "customer", customer.username)
     await db.commit()
+    invalidate_principal("customer", customer.username)
     await db.refresh(customer)
     return customer
 
@@ -89,8 +114,10 @@ async def change_customer_password(
     customer = result.scalar_one_or_none()
     if not customer:
         raise HTTPException(status_code=404, detail="Покупатель не найден")
-    customer.password_hash = hash_password(new_password)
+    customer.password_hash = await hash_password_async(new_password)
+    await revocation_list.revoke_principal(db, "customer", customer.username)
     await db.commit()
+    invalidate_principal("customer", customer.username)
     return {"detail": "Пароль обновлен"}
 
 @customer_router.delete("/{customer_id}")
@@ -103,7 +130,9 @@ async def delete_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="Покупатель не найден")
     await db.delete(customer)
+    await revocation_list.revoke_principal(db, "customer", customer.username)
     await db.commit()
+    invalidate_principal("customer", customer.username)
     return {"detail": "Покупатель удален"}
 
 # -------------------- EMPLOYEES --------------------
@@ -111,11 +140,15 @@ employee_router = APIRouter(prefix="/employees", tags=["Employees"])
 
 @employee_router.get("/", response_model=list[EmployeeOut])
 async def get_employees(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role("admin"))
 ):
-    result = await db.execute(select(Employee))
-    return result.scalars().all()
+    query = keyset_paginate(select(Employee), Employee.full_name, Employee.id, limit, after)
+    result = await db.execute(query)
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.full_name, row.id))
 
 @employee_router.get("/{employee_id}", response_model=EmployeeOut)
 async def get_employee(
@@ -139,7 +172,7 @@ async def create_employee(
         position=data.position,
         hire_date=data.hire_date,
         username=data.username,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password_async(data.password)
     )
     db.add(new_employee)
     await db.commit()
@@ -158,12 +191,14 @@ async def update_employee(
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
 
     for key, value in data.dict().items():
-        if key == "password":
-            setattr(employee, "password_hash", hash_password(value))
-        elif key != "username":
+        if key not in ["password", "username"]:
             setattr(employee, key, value)
 
+    # Токены отзываются, только если пароль действительно сменился
+    if await set_password(employee, data.password):
+        await revocation_list.revoke_principal(db, "admin", employee.username)
     await db.commit()
+    invalidate_principal("admin", employee.username)
     await db.refresh(employee)
     return employee
 
@@ -177,8 +212,10 @@ async def change_employee_password(
     employee = result.scalar_one_or_none()
     if not employee:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
-    employee.password_hash = hash_password(new_password)
+    employee.password_hash = await hash_password_async(new_password)
+    await revocation_list.revoke_principal(db, "admin", employee.username)
     await db.commit()
+    invalidate_principal("admin", employee.username)
     return {"detail": "Пароль обновлен"}
 
 @employee_router.delete("/{employee_id}")
@@ -191,7 +228,9 @@ async def delete_employee(
     if not employee:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
     await db.delete(employee)
+    await revocation_list.revoke_principal(db, "admin", employee.username)
     await db.commit()
+    invalidate_principal("admin", employee.username)
     return {"detail": "Сотрудник удален"}
 
 # -------------------- SUPPLIERS --------------------
@@ -199,11 +238,20 @@ supplier_router = APIRouter(prefix="/suppliers", tags=["Suppliers"])
 
 @supplier_router.get("/", response_model=list[SupplierOut])
 async def get_suppliers(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role("admin"))
 ):
-    result = await db.execute(select(Supplier))
-    return result.scalars().all()
+    not_modified = await conditional_get(request, response, db, "suppliers")
+    if not_modified:
+        return not_modified
+
+    query = keyset_paginate(select(Supplier), Supplier.name, Supplier.id, limit, after)
+    result = await db.execute(query)
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.name, row.id))
 
 @supplier_router.get("/{supplier_id}", response_model=SupplierOut)
 async def get_supplier(
@@ -228,7 +276,7 @@ async def create_supplier(
         email=data.email,
         address=data.address,
         username=data.username,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password_async(data.password)
     )
     db.add(new_supplier)
     await db.commit()
@@ -252,6 +300,7 @@ async def update_supplier(
             setattr(supplier, key, value)
 
     await db.commit()
+    invalidate_principal("supplier", supplier.username)
     await db.refresh(supplier)
     return supplier
 
@@ -265,8 +314,10 @@ async def change_supplier_password(
     supplier = result.scalar_one_or_none()
     if not supplier:
         raise HTTPException(status_code=404, detail="Поставщик не найден")
-    supplier.password_hash = hash_password(new_password)
+    supplier.password_hash = await hash_password_async(new_password)
+    await revocation_list.revoke_principal(db, "supplier", supplier.username)
     await db.commit()
+    invalidate_principal("supplier", supplier.username)
     return {"detail": "Пароль обновлен"}
 
 @supplier_router.delete("/{supplier_id}")
@@ -279,20 +330,83 @@ async def delete_supplier(
     if not supplier:
         raise HTTPException(status_code=404, detail="Поставщик не найден")
     await db.delete(supplier)
+    await revocation_list.revoke_principal(db, "supplier", supplier.username)
     await db.commit()
+    invalidate_principal("supplier", supplier.username)
     return {"detail": "Поставщик удален"}
 
 # -------------------- PRODUCT CATEGORY --------------------
 product_category_router = APIRouter(prefix="/product-categories", tags=["Product Categories"])
 
+# Дерево категорий меняется редко: держим его в памяти процесса и сбрасываем
+# при любом изменении категорий (TTL ограничивает расхождение между воркерами)
+CATEGORY_TREE_CACHE_TTL = 300
+CATEGORY_TREE_MAX_DEPTH = 32
+category_tree_cache = TTLCache(maxsize=256, ttl=CATEGORY_TREE_CACHE_TTL)
+
+def category_tree_query(root_id: int | None):
+    """WITH RECURSIVE по списку смежности: все узлы под root_id (или всё дерево) с глубиной и путём"""
+    anchor = select(
+        ProductCategory.id,
+        ProductCategory.name,
+        ProductCategory.parent_id,
+        literal(0).label("depth"),
+        array([cast(ProductCategory.name, Text)]).label("path")
+    )
+    if root_id is None:
+        anchor = anchor.where(ProductCategory.parent_id.is_(None))
+    else:
+        anchor = anchor.where(ProductCategory.id == root_id)
+
+    tree = anchor.cte("category_tree", recursive=True)
+    child = aliased(ProductCategory)
+    tree = tree.union_all(
+        select(
+            child.id,
+            child.name,
+            child.parent_id,
+            tree.c.depth + 1,
+            func.array_append(tree.c.path, cast(child.name, Text))
+        )
+        .join(tree, child.parent_id == tree.c.id)
+        # Защита от циклов в данных
+        .where(tree.c.depth < CATEGORY_TREE_MAX_DEPTH)
+    )
+    return select(tree).order_by(tree.c.path)
+
+async def get_category_tree_cached(db: AsyncSession, root_id: int | None) -> list[ProductCategoryTreeOut]:
+    nodes = category_tree_cache.get(root_id)
+    if nodes is None:
+        result = await db.execute(category_tree_query(root_id))
+        nodes = [ProductCategoryTreeOut(**row._mapping) for row in result.all()]
+        category_tree_cache.set(root_id, nodes)
+    return nodes
+
 @product_category_router.get("/", response_model=list[ProductCategoryOut])
 async def get_categories(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role(["admin"]))
 ):
+    not_modified = await conditional_get(request, response, db, "product_category")
+    if not_modified:
+        return not_modified
+
     result = await db.execute(select(ProductCategory))
     return result.scalars().all()
 
+@product_category_router.get("/tree", response_model=list[ProductCategoryTreeOut])
+async def get_category_tree(
+    root_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role(["admin", "supplier", "customer"]))
+):
+    nodes = await get_category_tree_cached(db, root_id)
+    if root_id is not None and not nodes:
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    return nodes
+
 @product_category_router.get("/{category_id}", response_model=ProductCategoryOut)
 async def get_category(
     category_id: int,
@@ -328,6 +442,7 @@ async def create_category(
     new_category = ProductCategory(**data.dict())
     db.add(new_category)
     await db.commit()
+    category_tree_cache.clear()
     await db.refresh(new_category)
     return new_category
 
@@ -355,6 +470,7 @@ async def update_category(
         setattr(category, key, value)
 
     await db.commit()
+    category_tree_cache.clear()
     await db.refresh(category)
     return category
 
@@ -379,18 +495,169 @@ async def delete_category(
 
     await db.delete(category)
     await db.commit()
+    category_tree_cache.clear()
     return {"detail": "Категория удалена"}
 
 # -------------------- PRODUCT --------------------
 product_router = APIRouter(prefix="/products", tags=["Products"])
 
+# Допустимые варианты сортировки каталога: колонка и признак убывания
+PRODUCT_SORTS = {
+    "name": ("name", False),
+    "-name": ("name", True),
+    "price": ("price", False),
+    "-price": ("price", True),
+}
+
+async def apply_stock_delta(db: AsyncSession, product_id: int, delta: int,
+                            supplier_id: int | None = None) -> int | None:
+    """
+    Атомарно изменяет остаток товара на delta, не допуская отрицательного остатка.
+    Возвращает новый остаток или None, если товара нет или остатка недостаточно.
+    """
+    query = (
+        update(Product)
+        .where(Product.id == product_id, Product.stock_quantity + delta >= 0)
+        .values(stock_quantity=Product.stock_quantity + delta)
+        .returning(Product.stock_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if supplier_id is not None:
+        query = query.where(Product.supplier_id == supplier_id)
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+async def raise_stock_update_error(db: AsyncSession, product_id: int, supplier_id: int | None = None):
+    # Вызывается только при неудачном UPDATE, чтобы отличить 404 от 409
+    product = await db.get(Product, product_id)
+    if product is None or (supplier_id is not None and product.supplier_id != supplier_id):
+        raise HTTPException(status_code=404, detail="Продукт не найден")
+    raise HTTPException(status_code=409, detail="Недостаточно товара на складе")
+
+@product_router.patch("/stock", response_model=list[ProductStockOut])
+async def update_products_stock_batch(
+    data: list[ProductStockBatchItem],
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_role(["admin", "supplier"]))
+):
+    deltas: dict[int, int] = {}
+    for item in data:
+        deltas[item.product_id] = deltas.get(item.product_id, 0) + item.quantity_change
+    if not deltas:
+        return []
+
+    # Все изменения применяются одним UPDATE ... FROM (VALUES ...) RETURNING
+    changes = values(column("id", Integer), column("delta", Integer), name="changes").data(list(deltas.items()))
+    query = (
+        update(Product)
+        .where(Product.id == changes.c.id, Product.stock_quantity + changes.c.delta >= 0)
+        .values(stock_quantity=Product.stock_quantity + changes.c.delta)
+        .returning(Product.id, Product.stock_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if current_user["role"] == "supplier":
+        query = query.where(Product.supplier_id == current_user["supplier_id"])
+
+    result = await db.execute(query)
+    updated = {row.id: row.stock_quantity for row in result.all()}
+
+    # Пачка применяется целиком или не применяется вовсе
+    failed = sorted(set(deltas) - set(updated))
+    if failed:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Остаток не изменён: товары не найдены или недостаточно количества: {failed}"
+        )
+
+    await db.commit()
+    return [ProductStockOut(product_id=product_id, stock_quantity=stock) for product_id, stock in updated.items()]
+
+@product_router.patch("/{product_id}/stock", response_model=ProductStockOut)
+async def update_product_stock(
+    product_id: int,
+    data: ProductStockUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_role(["admin", "supplier"]))
+):
+    supplier_id = current_user["supplier_id"] if current_user["role"] == "supplier" else None
+    stock_quantity = await apply_stock_delta(db, product_id, data.quantity_change, supplier_id)
+    if stock_quantity is None:
+        await raise_stock_update_error(db, product_id, supplier_id)
+
+    await db.commit()
+    return ProductStockOut(product_id=product_id, stock_quantity=stock_quantity)
+
+def products_query(name: str | None = None, category_id: int | None = None, supplier_id: int | None = None,
+                   min_price: float | None = None, max_price: float | None = None, in_stock: bool = False,
+                   sort: str = "name", limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    """Страница каталога с фильтрами и сортировкой (GET /products/)"""
+    query = select(Product)
+    if name:
+        query = query.where(Product.name.icontains(name, autoescape=True))
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if supplier_id is not None:
+        query = query.where(Product.supplier_id == supplier_id)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if in_stock:
+        query = query.where(Product.stock_quantity > 0)
+
+    sort_field, descending = PRODUCT_SORTS[sort]
+    return keyset_paginate(query, getattr(Product, sort_field), Product.id, limit, after, descending=descending)
+
+def product_search_query(q: str, limit: int, after: str | None = None):
+    """Полнотекстовый поиск (tsvector, GIN) плюс нечёткое совпадение названия (pg_trgm)"""
+    condition, rank = search_condition_and_rank(q)
+    return keyset_paginate(
+        select(Product, rank.label("rank")).where(condition),
+        rank, Product.id, limit, after, descending=True
+    )
+
 @product_router.get("/", response_model=list[ProductOut])
 async def get_products(
+    request: Request,
+    response: Response,
+    name: str | None = None,
+    category_id: int | None = None,
+    supplier_id: int | None = None,
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    in_stock: bool = False,
+    sort: Literal["name", "-name", "price", "-price"] = "name",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role(["admin", "supplier", "customer"]))
     ):
-    result = await db.execute(select(Product))
-    return result.scalars().all()
+    not_modified = await conditional_get(request, response, db, "products")
+    if not_modified:
+        return not_modified
+
+    query = products_query(name, category_id, supplier_id, min_price, max_price, in_stock, sort, limit, after)
+    sort_field, _ = PRODUCT_SORTS[sort]
+    result = await db.execute(query)
+    return keyset_page(
+        response, result.scalars().all(), limit,
+        lambda row: (getattr(row, sort_field), row.id)
+    )
+
+@product_router.get("/search", response_model=list[ProductOut])
+async def search_products(
+    response: Response,
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role(["admin", "supplier", "customer"]))
+):
+    # Результаты по убыванию релевантности с keyset-пагинацией по (rank, id)
+    result = await db.execute(product_search_query(q, limit, after))
+    rows = keyset_page(response, result.all(), limit, lambda row: (row.rank, row.Product.id))
+    return [row.Product for row in rows]
 
 @product_router.get("/{product_id}", response_model=ProductOut)
 async def get_product(
@@ -406,9 +673,15 @@ async def get_product(
 @product_router.get("/supplier/{supplier_id}", response_model=list[ProductOut])
 async def get_products_by_supplier(
     supplier_id: int,
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role(["admin", "supplier", "customer"]))
 ):
+    not_modified = await conditional_get(request, response, db, "products", "suppliers")
+    if not_modified:
+        return not_modified
+
     # Проверяем, существует ли поставщик
     supplier_result = await db.execute(select(Supplier).where(Supplier.id == supplier_id))
     supplier = supplier_result.scalar_one_or_none()
@@ -425,6 +698,65 @@ async def get_products_by_supplier(
     return products
 
 
+def category_products_query(category_ids: list[int], limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    """Страница товаров из набора категорий (поддерева)"""
+    return keyset_paginate(
+        select(Product).where(Product.category_id.in_(category_ids)),
+        Product.name, Product.id, limit, after
+    )
+
+def category_product_counts_query(category_ids: list[int]):
+    """Число товаров по каждой категории из набора"""
+    return (
+        select(Product.category_id, func.count())
+        .where(Product.category_id.in_(category_ids))
+        .group_by(Product.category_id)
+    )
+
+@product_router.get("/category/{category_id}", response_model=CategoryProductsOut)
+async def get_products_by_category(
+    category_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role(["admin", "supplier", "customer"]))
+):
+    # Поддерево категории берётся из кэшированного дерева (WITH RECURSIVE)
+    nodes = await get_category_tree_cached(db, category_id)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Категория не найдена")
+    category_ids = [node.id for node in nodes]
+
+    result = await db.execute(category_products_query(category_ids, limit, after))
+    items = keyset_page(response, result.scalars().all(), limit, lambda row: (row.name, row.id))
+
+    counts_result = await db.execute(category_product_counts_query(category_ids))
+    counts = dict(counts_result.all())
+
+    # Сворачиваем счётчики до прямых подкатегорий: каждый узел относим
+    # к предку первого уровня под выбранной категорией
+    parents = {node.id: node.parent_id for node in nodes}
+    facets = {node.id: 0 for node in nodes if node.depth == 1}
+    for node_id, count in counts.items():
+        top = node_id
+        while top in parents and parents[top] != category_id and top != category_id:
+            top = parents[top]
+        if top in facets:
+            facets[top] += count
+
+    names = {node.id: node.name for node in nodes}
+    return CategoryProductsOut(
+        category_id=category_id,
+        total_count=sum(counts.values()),
+        subcategories=[
+            CategoryFacetOut(category_id=node_id, name=names[node_id], products_count=count)
+            for node_id, count in facets.items()
+        ],
+        items=items
+    )
+
+
 @product_router.post("/", response_model=ProductOut, status_code=201)
 async def create_product(
     data: ProductCreate,
@@ -440,7 +772,7 @@ async def create_product(
 @product_router.put("/{product_id}", response_model=ProductOut)
 async def update_product(
     product_id: int,
-    data: ProductCreate,
+    data: ProductUpdate,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role("admin"))
 ):
@@ -449,7 +781,8 @@ async def update_product(
     if not product:
         raise HTTPException(status_code=404, detail="Продукт не найден")
 
-    for key, value in data.dict().items():
+    # Остаток меняется только относительными операциями (stock-operations, PATCH .../stock)
+    for key, value in data.dict(exclude_unset=True).items():
         setattr(product, key, value)
 
     await db.commit()
@@ -473,13 +806,38 @@ async def delete_product(
 # -------------------- ORDER --------------------
 order_router = APIRouter(prefix="/orders", tags=["Orders"])
 
+def orders_query(status: str | None = None, customer_id: int | None = None, start_date: date | None = None,
+                 end_date: date | None = None, limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    """Страница заказов с фильтрами (GET /orders/)"""
+    query = select(Order)
+    if status:
+        query = query.where(Order.status == status)
+    if customer_id is not None:
+        query = query.where(Order.customer_id == customer_id)
+    # Полуоткрытый интервал [start_date, end_date + 1 день) по самой колонке,
+    # чтобы условие оставалось индексируемым
+    if start_date:
+        query = query.where(Order.order_date >= start_date)
+    if end_date:
+        query = query.where(Order.order_date < end_date + timedelta(days=1))
+
+    # Новые заказы первыми: ключ (order_date DESC, id DESC)
+    return keyset_paginate(query, Order.order_date, Order.id, limit, after, descending=True)
+
 @order_router.get("/", response_model=list[OrderOut])
 async def get_orders(
+    response: Response,
+    status: str | None = None,
+    customer_id: int | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role(["customer", "admin"]))
 ):
-    result = await db.execute(select(Order))
-    return result.scalars().all()
+    result = await db.execute(orders_query(status, customer_id, start_date, end_date, limit, after))
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.order_date, row.id))
 
 @order_router.get("/{order_id}", response_model=OrderOut)
 async def get_order(
@@ -505,6 +863,82 @@ async def create_order(
     await db.refresh(new_order)
     return new_order
 
+@order_router.post("/checkout", response_model=OrderCheckoutOut, status_code=201)
+async def checkout_order(
+    data: OrderCheckoutCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_role(["admin", "customer"]))
+):
+    if current_user["role"] == "customer" and current_user["customer_id"] != data.customer_id:
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+    # Объединяем повторяющиеся позиции корзины
+    quantities: dict[int, int] = {}
+    for line in data.lines:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+
+    # Цены и названия берём из каталога одним запросом
+    products_result = await db.execute(
+        select(Product.id, Product.name, Product.price).where(Product.id.in_(quantities))
+    )
+    products = {row.id: row for row in products_result.all()}
+    missing = sorted(set(quantities) - set(products))
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Товары не найдены: {missing}")
+
+    total_amount = sum(products[product_id].price * quantity for product_id, quantity in quantities.items())
+    order_date = data.order_date or datetime.datetime.now(datetime.timezone.utc)
+
+    # Заказ и все его позиции записываются в одной транзакции
+    order_result = await db.execute(
+        insert(Order)
+        .values(
+            customer_id=data.customer_id,
+            order_date=order_date,
+            status=data.status,
+            total_amount=total_amount
+        )
+        .returning(Order.id)
+    )
+    order_id = order_result.scalar_one()
+
+    details_result = await db.execute(
+        insert(OrderDetail)
+        .values([
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_per_unit": products[product_id].price
+            }
+            for product_id, quantity in quantities.items()
+        ])
+        .returning(OrderDetail.id, OrderDetail.product_id, OrderDetail.quantity, OrderDetail.price_per_unit)
+    )
+    details = details_result.all()
+    await refresh_daily_sales_for_orders(db, [order_id])
+    await db.commit()
+
+    return OrderCheckoutOut(
+        id=order_id,
+        customer_id=data.customer_id,
+        order_date=order_date,
+        status=data.status,
+        total_amount=total_amount,
+        details=[
+            OrderDetailOut(
+                id=detail.id,
+                order_id=order_id,
+                product_id=detail.product_id,
+                product_name=products[detail.product_id].name,
+                quantity=detail.quantity,
+                price_per_unit=detail.price_per_unit,
+                order_date=order_date
+            )
+            for detail in details
+        ]
+    )
+
 @order_router.put("/{order_id}", response_model=OrderOut)
 async def update_order(
     order_id: int,
@@ -517,9 +951,12 @@ async def update_order(
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
+    previous_keys = await collect_daily_sales_keys(db, [order_id])
     for key, value in data.dict().items():
         setattr(order, key, value)
 
+    await db.flush()
+    await refresh_daily_sales_for_orders(db, [order_id], previous_keys)
     await db.commit()
     await db.refresh(order)
     return order
@@ -534,7 +971,10 @@ async def delete_order(
     order = result.scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
+    previous_keys = await collect_daily_sales_keys(db, [order_id])
     await db.delete(order)
+    await db.flush()
+    await refresh_daily_sales_for_orders(db, [], previous_keys)
     await db.commit()
     return {"detail": "Заказ удален"}
 
@@ -572,23 +1012,48 @@ async def get_recent_orders(
 # -------------------- ORDER DETAIL --------------------
 order_detail_router = APIRouter(prefix="/order-details", tags=["Order Details"])
 
+def order_detail_rows_query():
+    """Позиции заказов вместе с названием товара и датой заказа"""
+    return (
+        select(
+            OrderDetail,
+            Product.name.label("product_name"),
+            Order.order_date
+        )
+        .join(Product, OrderDetail.product_id == Product.id)
+        .join(Order, OrderDetail.order_id == Order.id)
+    )
+
+def order_details_page_query(limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    """Страница всех позиций по ключу (order_id, id) (GET /order-details/)"""
+    return keyset_paginate(order_detail_rows_query(), OrderDetail.order_id, OrderDetail.id, limit, after)
+
+def supplier_order_details_query(supplier_id: int, start_date: date | None = None, end_date: date | None = None):
+    """Позиции заказов с товарами поставщика за период"""
+    query = order_detail_rows_query().where(Product.supplier_id == supplier_id)
+    if start_date:
+        query = query.where(Order.order_date >= start_date)
+    if end_date:
+        # Include the entire end date by using <= end_date + 1 day
+        query = query.where(Order.order_date <= end_date + timedelta(days=1))
+    return query
+
 @order_detail_router.get("/", response_model=list[OrderDetailOut])
 async def get_order_details(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
     db: AsyncSession = Depends(get_db),
     _: TokenData = Depends(require_role("admin"))
 ):
+    query = order_details_page_query(limit, after)
     try:
         # Запрос с join для получения информации о товаре
-        result = await db.execute(
-            select(
-                OrderDetail,
-                Order.order_date,
-                Product.name.label("product_name")
-            )
-            .join(Order, OrderDetail.order_id == Order.id)
-            .join(Product, OrderDetail.product_id == Product.id)
+        result = await db.execute(query)
+        order_details = keyset_page(
+            response, result.all(), limit,
+            lambda row: (row.OrderDetail.order_id, row.OrderDetail.id)
         )
-        order_details = result.all()
 
         # Формируем ответ с включением названия товара
         return [
@@ -614,16 +1079,7 @@ async def get_order_detail(
         db: AsyncSession = Depends(get_db),
         _: TokenData = Depends(require_role("admin"))
 ):
-    result = await db.execute(
-        select(
-            OrderDetail,
-            Product.name.label("product_name"),
-            Order.order_date
-        )
-        .join(Product, OrderDetail.product_id == Product.id)
-        .join(Order, OrderDetail.order_id == Order.id)
-        .where(OrderDetail.id == order_detail_id)
-    )
+    result = await db.execute(order_detail_rows_query().where(OrderDetail.id == order_detail_id))
 
     detail = result.first()
     if not detail:
@@ -653,30 +1109,11 @@ async def get_order_details_by_supplier(
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
 
-    # 2. Build the base query
-    query = (
-        select(
-            OrderDetail,
-            Product.name.label("product_name"),
-            Order.order_date
-        )
-        .join(Product, OrderDetail.product_id == Product.id)
-        .join(Order, OrderDetail.order_id == Order.id)
-        .where(Product.supplier_id == supplier_id)
-    )
-
-    # 3. Apply date filters if provided
-    if start_date:
-        query = query.where(Order.order_date >= start_date)
-    if end_date:
-        # Include the entire end date by using <= end_date + 1 day
-        query = query.where(Order.order_date <= end_date + timedelta(days=1))
-
-    # 4. Execute the query
-    result = await db.execute(query)
+    # 2. Execute the query with optional date filters
+    result = await db.execute(supplier_order_details_query(supplier_id, start_date, end_date))
     details = result.all()
 
-    # 5. Return results or empty list instead of 404 if no results found
+    # 3. Return results or empty list instead of 404 if no results found
     return [
         OrderDetailSupplierOut(
             id=detail.OrderDetail.id,
@@ -691,6 +1128,98 @@ async def get_order_details_by_supplier(
     ]
 
 
+def supplier_sales_analytics_queries(supplier_id: int, start_date: date | None = None, end_date: date | None = None):
+    """Итоги, разбивка по товарам и по дням продаж поставщика за период"""
+    conditions = [Product.supplier_id == supplier_id]
+    if start_date:
+        conditions.append(Order.order_date >= start_date)
+    if end_date:
+        conditions.append(Order.order_date < end_date + timedelta(days=1))
+
+    quantity = func.coalesce(func.sum(OrderDetail.quantity), 0)
+    revenue = func.coalesce(func.sum(OrderDetail.quantity * OrderDetail.price_per_unit), 0)
+    orders_count = func.count(OrderDetail.order_id.distinct())
+
+    def aggregate(*columns):
+        # Все агрегаты считаются в PostgreSQL: размер ответа зависит
+        # от числа товаров и дней, а не от числа строк заказов
+        return (
+            select(*columns, quantity.label("quantity"), revenue.label("revenue"), orders_count.label("orders_count"))
+            .select_from(OrderDetail)
+            .join(Product, OrderDetail.product_id == Product.id)
+            .join(Order, OrderDetail.order_id == Order.id)
+            .where(*conditions)
+        )
+
+    # Литерал вместо параметра, чтобы выражения в SELECT и GROUP BY совпадали
+    day = cast(func.date_trunc(literal_column("'day'"), Order.order_date), Date)
+    return (
+        aggregate(func.count(OrderDetail.id).label("lines_count")),
+        aggregate(Product.id.label("product_id"), Product.name.label("product_name"))
+        .group_by(Product.id, Product.name)
+        .order_by(revenue.desc()),
+        aggregate(day.label("day")).group_by(day).order_by(day),
+    )
+
+@order_detail_router.get("/supplier/{supplier_id}/analytics", response_model=SupplierSalesAnalyticsOut)
+async def get_supplier_sales_analytics(
+        supplier_id: int,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        db: AsyncSession = Depends(get_db),
+        current_user: dict = Depends(require_role(["admin", "supplier"]))
+):
+    if current_user["role"] == "supplier" and current_user["supplier_id"] != supplier_id:
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+    supplier = await db.get(Supplier, supplier_id)
+    if not supplier:
+        raise HTTPException(status_code=404, detail="Supplier not found")
+
+    totals_query, by_product_query, by_day_query = supplier_sales_analytics_queries(supplier_id, start_date, end_date)
+    totals_result = await db.execute(totals_query)
+    totals = totals_result.one()
+    products_result = await db.execute(by_product_query)
+    days_result = await db.execute(by_day_query)
+
+    return SupplierSalesAnalyticsOut(
+        supplier_id=supplier_id,
+        start_date=start_date,
+        end_date=end_date,
+        lines_count=totals.lines_count,
+        total_quantity=totals.quantity,
+        total_revenue=totals.revenue,
+        orders_count=totals.orders_count,
+        products=[SupplierProductSalesOut(**row._mapping) for row in products_result.all()],
+        days=[SupplierDailySalesOut(**row._mapping) for row in days_result.all()]
+    )
+
+
+async def refresh_order_totals(db: AsyncSession, order_ids: set[int]) -> None:
+    """Пересчитывает orders.total_amount по позициям заказов в текущей транзакции"""
+    if not order_ids:
+        return
+    lines_total = (
+        select(func.coalesce(func.sum(OrderDetail.quantity * OrderDetail.price_per_unit), 0))
+        .where(OrderDetail.order_id == Order.id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(Order)
+        .where(Order.id.in_(order_ids))
+        .values(total_amount=lines_total)
+        .execution_options(synchronize_session=False)
+    )
+
+def order_detail_integrity_error(exc: IntegrityError) -> HTTPException:
+    """Повтор пары (заказ, товар) — 409, несуществующий заказ или товар — 400"""
+    if "uq_order_detail_order_product" in str(exc.orig):
+        return HTTPException(
+            status_code=409,
+            detail="Товар уже есть в заказе: измените существующую позицию или используйте /order_details/bulk"
+        )
+    return HTTPException(status_code=400, detail="Заказ или товар не существует")
+
 @order_detail_router.post("/", response_model=OrderDetailOut, status_code=201)
 async def create_order_detail(
         data: OrderDetailCreate,
@@ -699,6 +1228,13 @@ async def create_order_detail(
 ):
     new_order_detail = OrderDetail(**data.dict())
     db.add(new_order_detail)
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise order_detail_integrity_error(exc)
+    await refresh_order_totals(db, {new_order_detail.order_id})
+    await refresh_daily_sales_for_orders(db, [new_order_detail.order_id])
     await db.commit()
     await db.refresh(new_order_detail)
 
@@ -723,6 +1259,100 @@ async def create_order_detail(
         order_date=order.order_date
     )
 
+# Размер пачки для многострочного INSERT (ограничение asyncpg — 32767 параметров)
+BULK_CHUNK_SIZE = 1000
+
+def order_details_upsert_query(rows: list[dict]):
+    """
+    INSERT ... ON CONFLICT для пачки позиций; возвращает строки с названием
+    товара и датой заказа. К записанной позиции количество добавляется только
+    при той же цене — позиции с другой ценой не возвращаются
+    """
+    stmt = pg_insert(OrderDetail).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OrderDetail.order_id, OrderDetail.product_id],
+        set_={"quantity": OrderDetail.quantity + stmt.excluded.quantity},
+        where=OrderDetail.price_per_unit == stmt.excluded.price_per_unit
+    )
+    upserted = stmt.returning(
+        OrderDetail.id,
+        OrderDetail.order_id,
+        OrderDetail.product_id,
+        OrderDetail.quantity,
+        OrderDetail.price_per_unit
+    ).cte("upserted")
+
+    # Названия товаров и даты заказов получаем в том же операторе
+    return (
+        select(upserted, Product.name.label("product_name"), Order.order_date)
+        .join(Product, Product.id == upserted.c.product_id)
+        .join(Order, Order.id == upserted.c.order_id)
+    )
+
+def raise_price_conflict(pairs: set[tuple[int, int]]):
+    raise HTTPException(
+        status_code=409,
+        detail=f"Позиции с ценой, отличной от уже указанной, (order_id, product_id): {sorted(pairs)}"
+    )
+
+@order_detail_router.post("/bulk", response_model=list[OrderDetailOut], status_code=201)
+async def upsert_order_details_bulk(
+        data: list[OrderDetailCreate],
+        db: AsyncSession = Depends(get_db),
+        _: TokenData = Depends(require_role("admin"))
+):
+    # Повторяющиеся пары (order_id, product_id) внутри запроса объединяем заранее:
+    # ON CONFLICT не может изменить одну строку дважды в одном операторе.
+    # Объединяются только позиции с одинаковой ценой, иначе изменилась бы выручка
+    merged: dict[tuple[int, int], dict] = {}
+    conflicts: set[tuple[int, int]] = set()
+    for line in data:
+        key = (line.order_id, line.product_id)
+        if key not in merged:
+            merged[key] = line.dict()
+        elif round(merged[key]["price_per_unit"], 2) != round(line.price_per_unit, 2):
+            conflicts.add(key)
+        else:
+            merged[key]["quantity"] += line.quantity
+    if conflicts:
+        raise_price_conflict(conflicts)
+
+    rows = list(merged.values())
+    details = []
+    try:
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_CHUNK_SIZE]
+            result = await db.execute(order_details_upsert_query(chunk))
+            upserted = result.all()
+            details.extend(upserted)
+            # Не вернулись позиции, уже записанные с другой ценой
+            conflicts |= {(row["order_id"], row["product_id"]) for row in chunk} - {
+                (detail.order_id, detail.product_id) for detail in upserted
+            }
+        if conflicts:
+            await db.rollback()
+            raise_price_conflict(conflicts)
+        order_ids = {row["order_id"] for row in rows}
+        await refresh_order_totals(db, order_ids)
+        await refresh_daily_sales_for_orders(db, order_ids)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Заказ или товар не существует")
+
+    return [
+        OrderDetailOut(
+            id=detail.id,
+            order_id=detail.order_id,
+            product_id=detail.product_id,
+            product_name=detail.product_name,
+            quantity=detail.quantity,
+            price_per_unit=detail.price_per_unit,
+            order_date=detail.order_date
+        )
+        for detail in details
+    ]
+
 @order_detail_router.put("/{order_detail_id}", response_model=OrderDetailOut)
 async def update_order_detail(
     order_detail_id: int,
@@ -735,9 +1365,19 @@ async def update_order_detail(
     if not order_detail:
         raise HTTPException(status_code=404, detail="Деталь заказа не найдена")
 
+    previous_order_id = order_detail.order_id
+    previous_keys = await collect_daily_sales_keys(db, [previous_order_id])
     for key, value in data.dict().items():
         setattr(order_detail, key, value)
 
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise order_detail_integrity_error(exc)
+    order_ids = {previous_order_id, order_detail.order_id}
+    await refresh_order_totals(db, order_ids)
+    await refresh_daily_sales_for_orders(db, order_ids, previous_keys)
     await db.commit()
     await db.refresh(order_detail)
     return order_detail
@@ -752,7 +1392,12 @@ async def delete_order_detail(
     order_detail = result.scalar_one_or_none()
     if not order_detail:
         raise HTTPException(status_code=404, detail="Деталь заказа не найдена")
+    order_id = order_detail.order_id
+    previous_keys = await collect_daily_sales_keys(db, [order_id])
     await db.delete(order_detail)
+    await db.flush()
+    await refresh_order_totals(db, {order_id})
+    await refresh_daily_sales_for_orders(db, [], previous_keys)
     await db.commit()
     return {"detail": "Деталь заказа удалена"}
 
@@ -763,16 +1408,7 @@ async def get_order_details_by_customer(
         db: AsyncSession = Depends(get_db),
         _: TokenData = Depends(require_role(["admin", "customer"]))
 ):
-    result = await db.execute(
-        select(
-            OrderDetail,
-            Product.name.label("product_name"),
-            Order.order_date
-        )
-        .join(Order, OrderDetail.order_id == Order.id)
-        .join(Product, OrderDetail.product_id == Product.id)
-        .where(Order.customer_id == customer_id)
-    )
+    result = await db.execute(order_detail_rows_query().where(Order.customer_id == customer_id))
 
     details = result.all()
 
@@ -800,16 +1436,7 @@ async def get_order_details_by_order_id(
         _: TokenData = Depends(require_role(["admin", "customer"]))
 ):
     # Получаем данные с join
-    result = await db.execute(
-        select(
-            OrderDetail,
-            Product.name.label("product_name"),
-            Order.order_date
-        )
-        .join(Product, OrderDetail.product_id == Product.id)
-        .join(Order, OrderDetail.order_id == Order.id)
-        .where(OrderDetail.order_id == order_id)
-    )
+    result = await db.execute(order_detail_rows_query().where(OrderDetail.order_id == order_id))
 
     items = result.all()
 
@@ -825,4 +1452,231 @@ async def get_order_details_by_order_id(
             order_date=item.order_date
         )
         for item in items
-    ]
\ No newline at end of file
+    ]
+
+# -------------------- STOCK OPERATIONS --------------------
+stock_operation_router = APIRouter(prefix="/stock-operations", tags=["Stock Operations"])
+
+def stock_operations_query(product_id: int | None = None, limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    """Журнал складских операций, новые первыми"""
+    query = select(StockOperation)
+    if product_id is not None:
+        query = query.where(StockOperation.product_id == product_id)
+    return keyset_paginate(
+        query, StockOperation.operation_date, StockOperation.id, limit, after, descending=True
+    )
+
+@stock_operation_router.get("/", response_model=list[StockOperationOut])
+async def get_stock_operations(
+    response: Response,
+    product_id: int | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role("admin"))
+):
+    result = await db.execute(stock_operations_query(product_id, limit, after))
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.operation_date, row.id))
+
+@stock_operation_router.post("/", response_model=StockOperationResult, status_code=201)
+async def create_stock_operation(
+    data: StockOperationCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_role("admin"))
+):
+    employee_id = data.employee_id or current_user.get("employee_id")
+    if employee_id is None:
+        raise HTTPException(status_code=400, detail="Не указан сотрудник")
+
+    # Остаток меняется относительным UPDATE ... RETURNING, а запись журнала
+    # добавляется в той же транзакции: параллельные приходы и расходы
+    # не теряют обновления и не держат блокировки между запросами
+    delta = data.quantity if data.operation_type == "приход" else -data.quantity
+    stock_quantity = await apply_stock_delta(db, data.product_id, delta)
+    if stock_quantity is None:
+        await raise_stock_update_error(db, data.product_id)
+
+    operation = StockOperation(
+        product_id=data.product_id,
+        operation_type=data.operation_type,
+        quantity=data.quantity,
+        operation_date=data.operation_date or datetime.datetime.now(datetime.timezone.utc),
+        employee_id=employee_id
+    )
+    db.add(operation)
+    await db.commit()
+
+    return StockOperationResult(
+        id=operation.id,
+        product_id=operation.product_id,
+        operation_type=operation.operation_type,
+        quantity=operation.quantity,
+        operation_date=operation.operation_date,
+        employee_id=operation.employee_id,
+        stock_quantity=stock_quantity
+    )
+
+
+# -------------------- FINANCIAL REPORTS --------------------
+financial_report_router = APIRouter(prefix="/reports", tags=["Financial Reports"])
+
+def financial_reports_query(limit: int = DEFAULT_PAGE_SIZE, after: str | None = None):
+    return keyset_paginate(
+        select(FinancialReport), FinancialReport.report_date, FinancialReport.id, limit, after, descending=True
+    )
+
+def financial_report_insert(data: FinancialReportGenerate):
+    """
+    Выручка за период агрегируется из daily_sales и записывается
+    в отчёт одним оператором INSERT ... SELECT ... RETURNING
+    """
+    revenue = func.coalesce(func.sum(DailySales.revenue), 0)
+    expenses = literal(Decimal(str(data.total_expenses)), DailySales.revenue.type)
+    return (
+        insert(FinancialReport)
+        .from_select(
+            ["report_date", "total_revenue", "total_expenses", "profit"],
+            select(
+                literal(data.report_date or data.end_date, Date()),
+                revenue,
+                expenses,
+                revenue - expenses
+            )
+            .where(DailySales.day >= data.start_date, DailySales.day <= data.end_date)
+        )
+        .returning(*FinancialReport.__table__.c)
+    )
+
+@financial_report_router.get("/", response_model=list[FinancialReportOut])
+async def get_financial_reports(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role("admin"))
+):
+    result = await db.execute(financial_reports_query(limit, after))
+    return keyset_page(response, result.scalars().all(), limit, lambda row: (row.report_date, row.id))
+
+@financial_report_router.get("/{report_id}", response_model=FinancialReportOut)
+async def get_financial_report(
+    report_id: int,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role("admin"))
+):
+    report = await db.get(FinancialReport, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Отчёт не найден")
+    return report
+
+@financial_report_router.post("/", response_model=FinancialReportOut, status_code=201)
+async def generate_financial_report(
+    data: FinancialReportGenerate,
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role("admin"))
+):
+    if data.end_date < data.start_date:
+        raise HTTPException(status_code=400, detail="Дата окончания периода раньше даты начала")
+
+    result = await db.execute(financial_report_insert(data))
+    report = FinancialReportOut(**result.one()._mapping)
+    await db.commit()
+    return report
+
+
+# -------------------- DASHBOARD --------------------
+dashboard_router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+# Сводка кэшируется на несколько секунд, чтобы открытые админ-консоли
+# не пересчитывали её на каждом обновлении
+DASHBOARD_CACHE_TTL = 15
+dashboard_cache = TTLCache(maxsize=32, ttl=DASHBOARD_CACHE_TTL)
+dashboard_lock = asyncio.Lock()
+
+def dashboard_counts_query():
+    """Все счётчики и выручка — одним запросом из скалярных подзапросов"""
+    def count(model):
+        return select(func.count()).select_from(model).scalar_subquery()
+
+    return select(
+        count(Customer).label("customers_count"),
+        count(Employee).label("employees_count"),
+        count(Supplier).label("suppliers_count"),
+        count(Product).label("products_count"),
+        count(ProductCategory).label("categories_count"),
+        count(Order).label("orders_count"),
+        select(func.coalesce(func.sum(Order.total_amount), 0)).scalar_subquery().label("total_revenue")
+    )
+
+def recent_orders_query(limit: int):
+    return select(Order).order_by(Order.order_date.desc(), Order.id.desc()).limit(limit)
+
+@dashboard_router.get("/summary", response_model=DashboardSummaryOut)
+async def get_dashboard_summary(
+    recent_limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    _: TokenData = Depends(require_role("admin"))
+):
+    summary = dashboard_cache.get(recent_limit)
+    if summary is not None:
+        return summary
+
+    async with dashboard_lock:
+        # Пока ждали блокировку, сводку мог посчитать другой запрос
+        summary = dashboard_cache.get(recent_limit)
+        if summary is not None:
+            return summary
+
+        counts_result = await db.execute(dashboard_counts_query())
+        counts = counts_result.one()
+
+        recent_result = await db.execute(recent_orders_query(recent_limit))
+
+        summary = DashboardSummaryOut(
+            users_count=counts.customers_count + counts.employees_count + counts.suppliers_count,
+            customers_count=counts.customers_count,
+            employees_count=counts.employees_count,
+            suppliers_count=counts.suppliers_count,
+            products_count=counts.products_count,
+            categories_count=counts.categories_count,
+            orders_count=counts.orders_count,
+            total_revenue=counts.total_revenue,
+            recent_orders=[OrderOut.model_validate(order) for order in recent_result.scalars().all()]
+        )
+        dashboard_cache.set(recent_limit, summary)
+        return summary
+
+
+# -------------------- METRICS --------------------
+metrics_router = APIRouter(tags=["Metrics"])
+
+# Значения, которые уже считаются в других модулях, читаются в момент опроса
+Gauge("db_pool_connections", "Соединения пула SQLAlchemy", ["state"], collect=lambda: {
+    ("size",): engine.pool.size(),
+    ("checked_out",): engine.pool.checkedout(),
+    ("overflow",): max(engine.pool.overflow(), 0),
+})
+Gauge("password_hash_queue", "Очередь хэширования паролей", ["state"], collect=lambda: {
+    ("waiting",): password_hash_stats["waiting"],
+    ("in_flight",): password_hash_stats["in_flight"],
+    ("max_waiting",): password_hash_stats["max_waiting"],
+})
+Counter("password_hash_completed_total", "Выполненные операции bcrypt", collect=lambda: {
+    (): password_hash_stats["completed"],
+})
+
+METRIC_CACHES = {
+    "token_claims": token_claims_cache,
+    "principals": principal_cache,
+    "category_tree": category_tree_cache,
+    "dashboard": dashboard_cache,
+}
+Counter("cache_requests_total", "Обращения к in-memory кэшам", ["cache", "result"], collect=lambda: {
+    key: value
+    for name, cache in METRIC_CACHES.items()
+    for key, value in (((name, "hit"), cache.hits), ((name, "miss"), cache.misses))
+})
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
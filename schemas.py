@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 from datetime import datetime, date
 
 
@@ -11,6 +11,11 @@ class LoginRequest(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # срок действия access_token, секунды
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 
 # -------------------- CUSTOMER --------------------
@@ -80,6 +85,10 @@ class ProductCategoryOut(ProductCategoryBase):
     class Config:
         from_attributes = True
 
+class ProductCategoryTreeOut(ProductCategoryOut):
+    depth: int
+    path: list[str]
+
 # -------------------- PRODUCT --------------------
 class ProductBase(BaseModel):
     name: str
@@ -98,16 +107,33 @@ class ProductUpdate(BaseModel):
     supplier_id: int | None = None
     price: float | None = None
     description: str | None = None
-    stock_quantity: int | None = None
 
 class ProductOut(ProductBase):
     id: int
     class Config:
         from_attributes = True
 
+class CategoryFacetOut(BaseModel):
+    category_id: int
+    name: str
+    products_count: int
+
+class CategoryProductsOut(BaseModel):
+    category_id: int
+    total_count: int
+    subcategories: list[CategoryFacetOut]
+    items: list[ProductOut]
+
 class ProductStockUpdate(BaseModel):
     quantity_change: int
 
+class ProductStockBatchItem(ProductStockUpdate):
+    product_id: int
+
+class ProductStockOut(BaseModel):
+    product_id: int
+    stock_quantity: int
+
 # -------------------- ORDER --------------------
 class OrderBase(BaseModel):
     customer_id: int
@@ -128,7 +154,7 @@ class OrderOut(OrderBase):
 class OrderDetailBase(BaseModel):
     order_id: int
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
     price_per_unit: float
 
 class OrderDetailCreate(OrderDetailBase):
@@ -146,6 +172,19 @@ class OrderDetailOut(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderCheckoutLine(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+class OrderCheckoutCreate(BaseModel):
+    customer_id: int
+    order_date: Optional[datetime] = None
+    status: str = "Оплачен"
+    lines: list[OrderCheckoutLine] = Field(min_length=1)
+
+class OrderCheckoutOut(OrderOut):
+    details: list[OrderDetailOut]
+
 class OrderDetailSupplierOut(BaseModel):
     id: int
     order_id: int
@@ -156,4 +195,82 @@ class OrderDetailSupplierOut(BaseModel):
     order_date: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# -------------------- SUPPLIER ANALYTICS --------------------
+class SupplierProductSalesOut(BaseModel):
+    product_id: int
+    product_name: str
+    quantity: int
+    revenue: float
+    orders_count: int
+
+class SupplierDailySalesOut(BaseModel):
+    day: date
+    quantity: int
+    revenue: float
+    orders_count: int
+
+class SupplierSalesAnalyticsOut(BaseModel):
+    supplier_id: int
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    lines_count: int
+    total_quantity: int
+    total_revenue: float
+    orders_count: int
+    products: list[SupplierProductSalesOut]
+    days: list[SupplierDailySalesOut]
+
+
+# -------------------- STOCK OPERATION --------------------
+class StockOperationCreate(BaseModel):
+    product_id: int
+    operation_type: Literal["приход", "расход"]
+    quantity: int = Field(gt=0)
+    operation_date: Optional[datetime] = None
+    employee_id: Optional[int] = None
+
+class StockOperationOut(BaseModel):
+    id: int
+    product_id: int
+    operation_type: str
+    quantity: int
+    operation_date: datetime
+    employee_id: int
+    class Config:
+        from_attributes = True
+
+class StockOperationResult(StockOperationOut):
+    stock_quantity: int
+
+
+# -------------------- FINANCIAL REPORT --------------------
+class FinancialReportGenerate(BaseModel):
+    start_date: date
+    end_date: date
+    total_expenses: float = Field(0, ge=0)
+    report_date: Optional[date] = None
+
+class FinancialReportOut(BaseModel):
+    id: int
+    report_date: date
+    total_revenue: float
+    total_expenses: float
+    profit: float
+    class Config:
+        from_attributes = True
+
+
+# -------------------- DASHBOARD --------------------
+class DashboardSummaryOut(BaseModel):
+    users_count: int
+    customers_count: int
+    employees_count: int
+    suppliers_count: int
+    products_count: int
+    categories_count: int
+    orders_count: int
+    total_revenue: float
+    recent_orders: list[OrderOut]